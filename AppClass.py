@@ -3,6 +3,7 @@
 import sys
 import logging
 import os
+import time
 
 # Import Constants.py
 try:
@@ -22,6 +23,42 @@ except:
     logging.critical("Program closing...")
     sys.exit(0)
 
+# Import Engine.py
+try:
+    from Engine import *
+    logging.debug("Engine.py imported successfully")
+except:
+    logging.critical("Missing Engine.py")
+    logging.critical("Program closing...")
+    sys.exit(0)
+
+# Import Logger.py
+try:
+    from Logger import *
+    logging.debug("Logger.py imported successfully")
+except:
+    logging.critical("Missing Logger.py")
+    logging.critical("Program closing...")
+    sys.exit(0)
+
+# Import Profiler.py
+try:
+    from Profiler import *
+    logging.debug("Profiler.py imported successfully")
+except:
+    logging.critical("Missing Profiler.py")
+    logging.critical("Program closing...")
+    sys.exit(0)
+
+# Import GraphicsClasses.py
+try:
+    from GraphicsClasses import *
+    logging.debug("GraphicsClasses.py imported successfully")
+except:
+    logging.critical("Missing GraphicsClasses.py")
+    logging.critical("Program closing...")
+    sys.exit(0)
+
 # Import pygame
 try:
     # Disables starting pygame output
@@ -33,6 +70,13 @@ except:
     logging.critical("Program closing...")
     sys.exit(0)
 
+# Event posted by the search thread when the computer's move is ready so a waiting play loop wakes up
+SEARCHDONEEVENT = pygame.USEREVENT + 1
+# Events sent when the window is uncovered. Pygame 1 only has VIDEOEXPOSE and pygame 2 adds WINDOWEXPOSED
+EXPOSEEVENTS = tuple(eventType for eventType in (getattr(pygame, "VIDEOEXPOSE", None), getattr(pygame, "WINDOWEXPOSED", None)) if eventType is not None)
+# Pygame 2 can stop waiting for an event after a timeout. Pygame 1 waits until an event arrives
+WAITTIMEOUT = pygame.version.vernum[0] >= 2
+
 # Import of chess font
 if os.path.isfile("Fonts\\ChrysanthiUnicodeRegular-KEzo.ttf"):
     logging.debug("ChrysanthiUnicodeRegular-KEzo.ttf imported successfully")
@@ -52,14 +96,40 @@ class App:
         self.state = "start"
         # Image dictionary holding piece name as the key and piece image as the value
         self.images = {}
+        # Piece images decoded once and scaled for each square size
+        self.spriteAtlas = SpriteAtlas(os.path.join('IMG', 'Pieces'))
         # Stores the button name as key and the rect as value for the current screen
         self.buttonDict = {}
+        # Fonts and rendered text kept between frames
+        self.textCache = TextCache()
+        # Highlight and menu background surfaces kept between frames
+        self.surfacePool = SurfacePool()
         # Keeps track of whose the first move it is
         self.whiteFirstMove = True
         # Keeps track of whether to display the help menu
         self.help = False
+        # Keeps track of whether the black pieces are played by the computer
+        self.vsComputer = False
+        # Seconds the computer searches for each move
+        self.engineTime = 1.0
+        # Search running in the background for the computer's move or None if the computer is not thinking
+        self.searchJob = None
         # Keeps track of if the piece images have been imported successfully
         self.pieceImport = False
+        # Squares and ranks and files drawn once for the current resolution and copied onto the screen each frame
+        self.boardLayer = None
+        # Row and column as the key and the piece and highlights last drawn on the square as the value
+        self.drawnSquares = {}
+        # What was last drawn over the board as a tuple of if the computer is thinking, the game over text, and if the help menu is shown
+        self.drawnOverlays = None
+        # Keeps track of when the whole screen has to be drawn again instead of only the squares that changed
+        self.fullRedraw = True
+        # Rect the moving piece was last drawn at or None if no move is being animated
+        self.spriteRect = None
+        # Frame rate and section times drawn by the profiler, the time they were last rendered, and the rect they were last drawn at
+        self.profilerSurface = None
+        self.profilerUpdateTime = 0.0
+        self.profilerRect = None
         # Initializes pygame window to specific height and width defined
         self.screen = pygame.display.set_mode(self.displaySize)
         # Sets window title
@@ -77,18 +147,25 @@ class App:
 
     # Resets variables to starting values
     def reset(self):
+        # Stops the computer from finishing a move for the old game
+        self.cancelSearch()
         # Game class from ChessGameClasses.py
-        self.g = Game()
-        # Sets the players first move to the correct options
-        self.g.whitesMove = self.whiteFirstMove
-        # List of valid moves to compare with move made by the user
-        self.validMoves = self.g.getValidMoves()
+        # Sets up the starting position with the players first move set to the correct options
+        self.g = Game.fromFEN(STARTFEN if self.whiteFirstMove else STARTFEN.replace(" w ", " b "))
+        # Valid moves grouped by square to compare with move made by the user
+        self.moveIndex = self.g.getMoveIndex()
         # Identifies if a move was made so a new list of valid moves can be generated
         self.moveMade = False
         # Keeps track of when a move should be animated
         self.animate = False
+        # Time the current player's turn started, used to log how long each move took
+        self.turnStartTime = time.perf_counter()
+        # Animations of the moves made with the one being shown first
+        self.animations = []
         # Keeps track of when the game is over
         self.gameOver = False
+        # Keeps track of whether the computer's search failed so the game is stopped instead of waiting for a move that will not come
+        self.engineError = False
         # Keeps track of the square clicked as tuple of row and column
         self.squareSelected = ()
         # Keeps track of where a piece starts and where it moves to as list of squareSelected
@@ -96,9 +173,14 @@ class App:
 
     # Main program function where other functions are called from
     def run(self):
+        # Keeps track of when the menu has to be drawn again
+        redraw = True
         while True:
-            # Checks the user input
-            for event in pygame.event.get():
+            # Checks the user input, sleeping until there is some
+            for event in self.getEvents():
+                # Anything other than moving the mouse can change the menu
+                if event.type != pygame.MOUSEMOTION:
+                    redraw = True
                 # Allows for X to close the window
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -134,22 +216,18 @@ class App:
                                     self.state = "resolution"
                                 elif key == "First Move":
                                     self.state = "first"
+                                elif key == "Opponent":
+                                    self.state = "opponent"
                             # Checks to see what option was clicked and changes the resolution depending on the choice
                             elif self.state == "resolution":
                                 if key == "←":
                                     self.state = "options"
                                 elif key == "512 x 512":
-                                    self.displaySize = (512, 512)
-                                    self.squareSize = self.displaySize[0] // SQUARES
-                                    self.screen = pygame.display.set_mode(self.displaySize)
+                                    self.setResolution((512, 512))
                                 elif key == "768 x 768":
-                                    self.displaySize = (768, 768)
-                                    self.squareSize = self.displaySize[0] // SQUARES
-                                    self.screen = pygame.display.set_mode(self.displaySize)
+                                    self.setResolution((768, 768))
                                 elif key == "1024 x 1024":
-                                    self.displaySize = (1024, 1024)
-                                    self.squareSize = self.displaySize[0] // SQUARES
-                                    self.screen = pygame.display.set_mode(self.displaySize)
+                                    self.setResolution((1024, 1024))
                             # Checks to see what color was clicked and changes the first move depending on the choice
                             elif self.state == "first":
                                 if key == "←":
@@ -160,25 +238,57 @@ class App:
                                 elif key == "♚"or key == "Black":
                                     self.whiteFirstMove = False
                                     self.reset()
+                            # Checks to see who was clicked and changes the opponent depending on the choice
+                            elif self.state == "opponent":
+                                if key == "←":
+                                    self.state = "options"
+                                elif key == "Human":
+                                    self.vsComputer = False
+                                    self.reset()
+                                elif key == "Computer":
+                                    self.vsComputer = True
+                                    self.reset()
                                     
             # Calls the corresponding function to change the screen based on the current state
-            if self.state == "start":
-                self.drawStartMenu()
-            elif self.state == "how":
-                self.drawHowToPlay()
-            elif self.state == "play":
+            if self.state == "play":
                 self.play()
-            elif self.state == "options":
-                self.drawOptionsMenu()
-            elif self.state == "resolution":
-                self.drawResolutions()
-            elif self.state == "first":
-                self.drawFirstMove()
-            
+                # The menu returned to has not been drawn yet
+                redraw = True
+            # Only draws the menu again once something could have changed it
+            elif redraw:
+                if self.state == "start":
+                    self.drawStartMenu()
+                elif self.state == "how":
+                    self.drawHowToPlay()
+                elif self.state == "options":
+                    self.drawOptionsMenu()
+                elif self.state == "resolution":
+                    self.drawResolutions()
+                elif self.state == "first":
+                    self.drawFirstMove()
+                elif self.state == "opponent":
+                    self.drawOpponent()
+                # Updates screen
+                pygame.display.flip()
+                redraw = False
+            profiler.frame()
+
+    # Returns the events to handle. Sleeps until an event arrives while nothing is moving on screen and otherwise keeps to the frame rate given
+    def getEvents(self, framesPerSecond=None, timeout=IDLETIMEOUT):
+        if framesPerSecond is not None:
             # Maximum amount of frames displayed every second
-            self.clock.tick(FPS)
-            # Updates screen
-            pygame.display.flip()
+            self.clock.tick(framesPerSecond)
+            return pygame.event.get()
+        # Waits for the next event or until the timeout passes, then takes any others waiting with it
+        event = pygame.event.wait(timeout) if WAITTIMEOUT else pygame.event.wait()
+        events = [] if event.type == pygame.NOEVENT else [event]
+        return events + pygame.event.get()
+
+    # Wakes up the play loop once the computer's search is done. Called from the search thread
+    @staticmethod
+    def postSearchDone():
+        if pygame.get_init():
+            pygame.event.post(pygame.event.Event(SEARCHDONEEVENT))
 
     # Draws start menu
     def drawStartMenu(self):
@@ -197,7 +307,7 @@ class App:
     def drawHowToPlay(self):
         self.drawBaseMenu(LIGHTGRAY, back=True, backSize=self.displaySize[0] // 8, backColor=MENUGRAY, backLocation=(self.displaySize[0] // 20, self.displaySize[0] // 24))
         # Draws how to play text
-        self.drawText("This is a multiplayer chess game that goes by normal chess rules. The pieces are moved by clicking on the piece and then clicking again on where the piece should move to. The white pieces have the first turn unless changed in the options. The games will continue until a checkmate or a stalemate occurs. Some helpful keyboard shortcuts are listed below:", 
+        self.drawText("This is a multiplayer chess game that goes by normal chess rules. The pieces are moved by clicking on the piece and then clicking again on where the piece should move to. The white pieces have the first turn unless changed in the options. The games will continue until a checkmate, a stalemate, or a draw occurs. Some helpful keyboard shortcuts are listed below:", 
                       self.displaySize[0] // 32, MENUGRAY, rect=(self.displaySize[0] // 10, self.displaySize[0] // 10, self.displaySize[0] - self.displaySize[0] // 10 * 2, self.displaySize[0] - self.displaySize[0] // 10 * 2))
         # Draws keyboard shortcuts
         self.drawText("H - Displays a help menu during the game with these tips", 
@@ -217,6 +327,7 @@ class App:
         # Draws options
         self.drawText(" Screen Resolution ", self.displaySize[0] // 12, LIGHTGRAY, center=(self.displaySize[0] // 2, (self.displaySize[0] * 3 // 8) + (self.displaySize[0] // 16)), backgroundColor=MENUGRAY, isButton=True)
         self.drawText(" First Move ", self.displaySize[0] // 12, LIGHTGRAY, center=(self.displaySize[0] // 2, (self.displaySize[0] * 4 // 8) + (self.displaySize[0] // 16)), backgroundColor=MENUGRAY, isButton=True)
+        self.drawText(" Opponent ", self.displaySize[0] // 12, LIGHTGRAY, center=(self.displaySize[0] // 2, (self.displaySize[0] * 5 // 8) + (self.displaySize[0] // 16)), backgroundColor=MENUGRAY, isButton=True)
 
     # Draw screen resolutions menu
     def drawResolutions(self):
@@ -237,6 +348,23 @@ class App:
             self.drawText(" White ", self.displaySize[0] // 10, WHITE, center=(self.displaySize[0] // 2, (self.displaySize[0] * 7 // 16) + (self.displaySize[0] // 16)), backgroundColor=GREEN if self.whiteFirstMove else RED, isButton=True)
             self.drawText(" Black ", self.displaySize[0] // 10, BLACK, center=(self.displaySize[0] // 2, (self.displaySize[0] * 10 // 16) + (self.displaySize[0] // 16)), backgroundColor=GREEN if not self.whiteFirstMove else RED, isButton=True)
 
+    # Draw opponent option menu
+    def drawOpponent(self):
+        self.drawBaseMenu(LIGHTGRAY, title=True, titleText="Opponent", titleSize=self.displaySize[0] // 8, titleColor=MENUGRAY, titleLocation=(self.displaySize[0] // 2, self.displaySize[0] // 4), back=True, backSize=self.displaySize[0] // 8, backColor=MENUGRAY, backLocation=(self.displaySize[0] // 20, self.displaySize[0] // 24))
+        # Draws buttons to play against another person or the computer with the current choice in green
+        self.drawText(" Human ", self.displaySize[0] // 10, WHITE, center=(self.displaySize[0] // 2, (self.displaySize[0] * 7 // 16) + (self.displaySize[0] // 16)), backgroundColor=GREEN if not self.vsComputer else RED, isButton=True)
+        self.drawText(" Computer ", self.displaySize[0] // 10, WHITE, center=(self.displaySize[0] // 2, (self.displaySize[0] * 10 // 16) + (self.displaySize[0] // 16)), backgroundColor=GREEN if self.vsComputer else RED, isButton=True)
+
+    # Determines if it is the computer's turn to move
+    def isComputersTurn(self):
+        return self.vsComputer and not self.g.whitesMove
+
+    # Stops the computer's search if one is running
+    def cancelSearch(self):
+        if self.searchJob is not None:
+            self.searchJob.cancel()
+            self.searchJob = None
+
     # Draws the basic structure of a menu
     def drawBaseMenu(self, backgroundColor, title=False, titleText=None, titleSize=None, titleColor=None, titleBackgroundColor=None, titleLocation=None, back=False, backSize=None, backColor=None, backLocation=None, backgroundOpacity=255):
         # Clears button dictionary
@@ -254,16 +382,24 @@ class App:
     def play(self):
         # Call of load image function before while loop to set piece images once
         self.loadImages()
+        # Builds the board layer again if the resolution changed since it was built
+        if self.boardLayer is None or self.boardLayer.get_size() != self.displaySize:
+            self.buildBoardLayer()
+        # The screen was last used by a menu so all of it is drawn
+        self.fullRedraw = True
         # Keeps tracks of if game should be displayed
         playRunning = True
         # Main loop for game to run in
         while playRunning:
-            # Checks the user input
-            for event in pygame.event.get():
+            # Checks the user input. Frames are kept to a fixed rate while a move is animated or the screen has to be drawn, otherwise it sleeps until an event. The profiler times are drawn a few times a second
+            for event in self.getEvents(ANIMATIONFPS if self.animations else FPS if self.fullRedraw else None, int(PROFILERREFRESH * 1000) if profiler.enabled else IDLETIMEOUT):
                 # Allows for X to close the window
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit(0)
+                # Draws the whole screen again once the window is uncovered
+                elif event.type in EXPOSEEVENTS:
+                    self.fullRedraw = True
                 # Checks if left mouse click is made
                 elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     # Coordinates of the mouse click
@@ -274,8 +410,8 @@ class App:
                         if not pygame.Rect(self.displaySize[0] // 12, int(self.displaySize[0] * 5.5 // 24), self.displaySize[0] - self.displaySize[0] // 12 * 2, self.displaySize[0] * 13 // 24).collidepoint(mouse):
                             # Closes the help screen
                             self.help = False
-                    # Checks to make sure the moves can still be made
-                    if not self.gameOver and not self.help:
+                    # Checks to make sure the moves can still be made and it is not the computer's turn
+                    if not self.gameOver and not self.help and not self.isComputersTurn():
                         # Determines which square was clicked
                         column = mouse[0]//self.squareSize
                         row = mouse[1]//self.squareSize
@@ -290,25 +426,24 @@ class App:
                             self.playerClicks = []
                         # Moves the piece if a unique second click was made
                         if len(self.playerClicks) == 2:
-                            # Tells what the move was
-                            move = Move(self.playerClicks[0], self.playerClicks[1], self.g.board)
+                            # Finds the valid move between the clicked squares, or None if there is not one. A promotion is made to the piece in promotionChoice
+                            move = self.moveIndex.getMove(self.playerClicks[0], self.playerClicks[1], self.g.promotionChoice)
                             # Makes sure a valid move is made
-                            for i in range(len(self.validMoves)):
-                                # Move class equality operator is used to compare objects of the Move class
-                                if move == self.validMoves[i]:
-                                    # The move is made
-                                    self.g.makeMove(self.validMoves[i])
-                                    self.moveMade = True
-                                    self.animate = True
-                                    # Resets clicks allowing for another move to be made
-                                    self.squareSelected = ()
-                                    self.playerClicks = []
+                            if move is not None:
+                                # The move is made
+                                self.g.makeMove(move)
+                                logMove(move, len(self.g.moveHistory), time.perf_counter() - self.turnStartTime)
+                                self.moveMade = True
+                                self.animate = True
+                                # Resets clicks allowing for another move to be made
+                                self.squareSelected = ()
+                                self.playerClicks = []
                             if not self.moveMade:
                                 # Selects a new piece if an invalid move was made
                                 self.playerClicks = [self.squareSelected]
                                 self.animate = False
                     # Checks to see if a button was clicked once the game finished
-                    else:
+                    elif self.gameOver:
                         # Iterates through all the buttons to see if one was clicked
                         for key, value in self.buttonDict.items():
                             # Checks if the mouse click was at the location of a button
@@ -330,11 +465,20 @@ class App:
                     if not self.help:
                         # Checks if the 'z' key is pressed 
                         if event.key == pygame.K_z:
+                            # Stops the computer from finishing a move for the position being undone
+                            self.cancelSearch()
+                            # Stops animating moves that are being undone
+                            self.animations = []
                             # The move is undone
                             self.g.undoMove()
+                            # Undoes the computer's move as well so it is the player's turn again
+                            if self.isComputersTurn() and len(self.g.moveHistory) != 0:
+                                self.g.undoMove()
                             # Allows for new moves to be generated
                             self.moveMade = True
                             self.gameOver = False
+                            # Lets the computer search again from the position the moves were undone to
+                            self.engineError = False
                         # Checks if 'r' key is pressed
                         elif event.key == pygame.K_r:
                             # Resets game back to starting values
@@ -345,64 +489,106 @@ class App:
                             self.reset()
                             playRunning = False
                             self.state = "start"
+                    # Checks if 'p' key is pressed
+                    if event.key == pygame.K_p:
+                        # Shows or hides the frame rate and section times
+                        profiler.toggle()
                     # Checks if the game has ended
                     if not self.gameOver:
                         # Checks if 'h' key is pressed
                         if event.key == pygame.K_h:
                             self.help = not self.help
 
+            # Starts the computer's search in the background on its turn and makes the move once the search is done
+            if self.isComputersTurn() and not self.moveMade and not self.gameOver and not self.g.checkmate and not self.g.stalemate:
+                if self.searchJob is None:
+                    self.searchJob = SearchJob(Engine(timeLimit=self.engineTime), self.g, onDone=self.postSearchDone)
+                elif self.searchJob.isDone() and not self.help:
+                    result = self.searchJob.result
+                    self.searchJob = None
+                    if result is not None:
+                        profiler.record("search", result.seconds)
+                    if result is not None and result.bestMove is not None:
+                        self.g.makeMove(result.bestMove)
+                        logMove(result.bestMove, len(self.g.moveHistory), result.seconds, result.nodes)
+                        self.moveMade = True
+                        self.animate = True
+                    else:
+                        # Stops the game and shows the error when the search failed or found no move so the search is not started again forever
+                        logging.error("Search gave no move for " + self.g.getFEN())
+                        self.engineError = True
+                        self.gameOver = True
+
             # After a move occurs
             if self.moveMade:
                 if self.animate:
-                    # Animates the previous move made
-                    self.animateMove(self.g.moveHistory[-1])
+                    # Adds the previous move made to the animations shown while the game continues
+                    self.queueAnimation(self.g.moveHistory[-1])
                 # Generates a new set of valid moves
-                self.validMoves = self.g.getValidMoves()
+                with profiler.section("getMoveIndex"):
+                    self.moveIndex = self.g.getMoveIndex()
                 self.moveMade = False
+                # Starts timing the next player's turn
+                self.turnStartTime = time.perf_counter()
                 self.animate = False
 
-            # Draws board and pieces
-            self.drawPlayScreen()
-
             # Checks if the game has ended
-            if self.g.checkmate:
-                # Ends the game and prints out the winner
+            gameOverText = None
+            drawReason = self.g.getDrawReason()
+            if self.engineError:
+                # Shows the search failed instead of the computer making a move
+                gameOverText = " Engine Error "
+            elif self.g.checkmate:
+                # Ends the game and sets the winner to be printed out
                 self.gameOver = True
-                self.drawGameOver(" Black Wins " if self.g.whitesMove else " White Wins ")
+                gameOverText = " Black Wins " if self.g.whitesMove else " White Wins "
             elif self.g.stalemate:
-                # Ends the game and prints out stalemate
+                # Ends the game and sets stalemate to be printed out
                 self.gameOver = True
-                self.drawGameOver(" Stalemate ")
-
-            # Checks if help menu should be displayed
-            if self.help:
-                # Displays a help menu
-                self.drawHelp()
+                gameOverText = " Stalemate "
+            elif drawReason is not None:
+                # Ends the game and sets the kind of draw to be printed out
+                self.gameOver = True
+                gameOverText = {"repetition": " Repetition Draw ", "fifty move rule": " Fifty Move Draw ", "insufficient material": " Material Draw "}[drawReason]
 
-            # Maximum amount of frames displayed every second
-            self.clock.tick(FPS)
-            # Updates screen
-            pygame.display.flip()
+            # Draws and updates only the parts of the screen that changed
+            with profiler.section("drawFrame"):
+                self.drawFrame(gameOverText)
+            profiler.frame()
 
     # Inputs piece images into IMAGES dictionary
     def loadImages(self):
         try:
-            # Adds piece images to dictionary as value and piece name as key
-            path = os.path.join('IMG','Pieces')
-            for filename in os.listdir(path):
-                # Resizes images to fit in squares before inputting
-                self.images[os.path.splitext(filename)[0]] = pygame.transform.scale(pygame.image.load(os.path.join(path, filename)), (self.squareSize, self.squareSize))
+            # Decodes the piece images the first time the game is shown. This is done here on the main thread since the background thread only resizes them
+            if not self.spriteAtlas.originals:
+                self.spriteAtlas.load()
+            # Gets the piece images resized to fit in squares with piece name as key. They are only resized the first time a size is used
+            self.images = self.spriteAtlas.getImages(self.squareSize)
             if len(self.images) < 12:
                 logging.critical("Piece images missing")
                 logging.critical("Program closing...")
                 pygame.quit()
                 sys.exit(0)
+            # Logs the pieces successully imported the first time they are loaded
+            if not self.pieceImport:
+                logging.debug("Piece images imported successfuly")
+                self.pieceImport = True
         except:
             logging.critical("Piece images unable to import")
             logging.critical("Program closing...")
             pygame.quit()
             sys.exit(0)
 
+    # Changes the size of the window and clears everything drawn for the old size
+    def setResolution(self, displaySize):
+        self.displaySize = displaySize
+        self.squareSize = self.displaySize[0] // SQUARES
+        self.screen = pygame.display.set_mode(self.displaySize)
+        self.textCache.clear()
+        self.surfacePool.clear()
+        # Starts resizing the piece images so they are ready when the game is shown
+        self.spriteAtlas.prepare(self.squareSize)
+
     #Returns the color of a board's square depending on the location
     @staticmethod
     def boardSquareColor(row, column, reverse=False):
@@ -414,13 +600,10 @@ class App:
     """ Display Functions """
     # Print text onto the screen
     def drawText(self, text, textSize, textColor, center=(), backgroundColor=None, fontName="Consolas", sFont=True, isButton=False, rect=None):
-        # Initializes font
-        font = pygame.font.SysFont(fontName, textSize) if sFont else pygame.font.Font(fontName, textSize)
-        
         # Draws a single line of text centered at the position
         if not rect:
-            # Renders text and colors
-            textObject = font.render(text, True, textColor, backgroundColor)
+            # Renders text and colors or reuses the text rendered in an earlier frame
+            textObject = self.textCache.render(text, fontName, textSize, sFont, textColor, backgroundColor)
             # Places text at the specified location
             textRect = textObject.get_rect()
             textRect.center = center
@@ -434,72 +617,176 @@ class App:
             # Spaces between lines outputted
             lineSpacing = -2
             # Gets the height in pixels of the font
-            fontHeight = font.size(fontName)[1]
-            
-            while text:
-                i = 1
-                # Determines the maximum width of the line of text
-                while font.size(text[:i])[0] < textRect.width and i < len(text):
-                    i += 1
-
-                # Checks if the text has been wrapped
-                if i < len(text):
-                    # Adjusts the text wrapping to the last word
-                    i = text.rfind(" ", 0, i) + 1
+            fontHeight = self.textCache.getFont(fontName, textSize, sFont).size(fontName)[1]
 
+            # Splits the text into lines that fit in the area
+            for line in self.textCache.wrapText(text, fontName, textSize, sFont, textRect.width):
                 # Renders text and colors
-                textObject = font.render(text[:i], True, textColor, backgroundColor)
+                textObject = self.textCache.render(line, fontName, textSize, sFont, textColor, backgroundColor)
                 # Displays the line of text on screen
                 self.screen.blit(textObject, (textRect.left, y))
                 # Moves to the next line
                 y += fontHeight + lineSpacing
-                #Removes the text already displayed
-                text = text[i:]
 
         # Checks if the text drawn is a button
         if isButton:
             # Adds the button name as key and rect as value to button dictionary
             self.buttonDict[text.strip()] = textRect
-
-    # Draws graphics on the screen
-    def drawPlayScreen(self):
-        # Draw the squares on the board
-        self.drawBoard()
-        # Highlights squares of the piece selected with possible moves
-        self.highlightSquares()
-        # Draws the ranks and files on the board
-        self.drawRankFiles()
-        # Draws the pieces on top of the squares
-        self.drawPieces()
-
-    # Draws squares on the board
-    def drawBoard(self):
+        return textRect
+
+    # Draws every square of the board with its highlights and piece
+    def drawPlayScreen(self, squareStates):
+        for square, state in squareStates.items():
+            self.drawSquare(square, state)
+
+    # Draws the parts of the play screen that changed since the last frame and updates only those parts of the window
+    def drawFrame(self, gameOverText):
+        # Finds the animation being shown and where its moving piece is
+        now = time.perf_counter()
+        animation = self.updateAnimations(now)
+        spriteRect = None
+        if animation is not None:
+            x, y = animation.getPosition(now)
+            spriteRect = pygame.Rect(int(y * self.squareSize), int(x * self.squareSize), self.squareSize, self.squareSize)
+        # Everything drawn over the board
+        overlays = (self.searchJob is not None, gameOverText, self.help, profiler.enabled)
+        squareStates = self.getSquareStates(animation)
+        # Finds the squares with a different piece or highlight than was last drawn
+        changedSquares = {square: state for square, state in squareStates.items() if self.drawnSquares.get(square) != state}
+        # Draws the squares under where the moving piece was and is again so it does not leave a trail, and the squares under the profiler times since they change size
+        for rect in (self.spriteRect, spriteRect, self.profilerRect):
+            if rect is not None:
+                for square in self.getSquaresUnder(rect):
+                    changedSquares[square] = squareStates[square]
+        # The whole screen is drawn again when something drawn over the board appears or disappears or the board changes under a menu
+        if overlays != self.drawnOverlays or (changedSquares and (gameOverText is not None or self.help)):
+            self.fullRedraw = True
+        if self.fullRedraw:
+            # Draws board and pieces
+            self.drawPlayScreen(squareStates)
+            # Displays moved piece at current frame in animation
+            if spriteRect is not None:
+                self.screen.blit(self.images[animation.move.pieceMoved], spriteRect)
+            # Shows that the computer is searching for its move
+            if self.searchJob is not None:
+                self.drawThinking()
+            # Prints out the winner or stalemate once the game has ended
+            if gameOverText is not None:
+                self.drawGameOver(gameOverText)
+            # Checks if help menu should be displayed
+            if self.help:
+                # Displays a help menu
+                self.drawHelp()
+            # Shows the frame rate and section times on top of everything
+            self.profilerRect = self.drawProfiler() if profiler.enabled else None
+            # Updates screen
+            pygame.display.flip()
+            self.drawnOverlays = overlays
+            self.fullRedraw = False
+        elif changedSquares or profiler.enabled:
+            # Draws the changed squares
+            dirtyRects = [self.drawSquare(square, state) for square, state in changedSquares.items()]
+            # Displays moved piece at current frame in animation on top of the squares
+            if spriteRect is not None:
+                self.screen.blit(self.images[animation.move.pieceMoved], spriteRect)
+            # Draws the thinking text again in case a square under it was drawn
+            if self.searchJob is not None:
+                dirtyRects.append(self.drawThinking())
+            # Draws the profiler times every frame since they keep changing
+            if profiler.enabled:
+                self.profilerRect = self.drawProfiler()
+                dirtyRects.append(self.profilerRect)
+            # Updates only the parts of the screen that changed
+            pygame.display.update(dirtyRects)
+        self.spriteRect = spriteRect
+
+    # Shows that the computer is searching for its move and returns the rect of the text
+    def drawThinking(self):
+        return self.drawText(" Thinking... ", self.displaySize[0] // 24, LIGHTGRAY, center=(self.displaySize[0] // 2, self.squareSize // 2), backgroundColor=MENUGRAY)
+
+    # Draws the frame rate and section times in the top left corner and returns the rect drawn over
+    def drawProfiler(self):
+        now = time.perf_counter()
+        # The times are only rendered again a few times a second so they can be read and do not fill the text cache
+        if self.profilerSurface is None or now - self.profilerUpdateTime >= PROFILERREFRESH:
+            font = self.textCache.getFont("Consolas", self.displaySize[0] // 48)
+            lines = [font.render(line, True, GREEN) for line in profiler.getLines()]
+            # The size changes with the text so the surface is made here instead of being kept in the surface pool
+            self.profilerSurface = pygame.Surface((max(line.get_width() for line in lines) + 8, sum(line.get_height() for line in lines) + 8)).convert()
+            self.profilerSurface.set_alpha(200)
+            self.profilerSurface.fill(BLACK)
+            y = 4
+            for line in lines:
+                self.profilerSurface.blit(line, (4, y))
+                y += line.get_height()
+            self.profilerUpdateTime = now
+        return self.screen.blit(self.profilerSurface, (0, 0))
+
+    # Returns the row and column of every square as the key and a tuple of the piece and the highlights on the square as the value. The board under an animation is used while one is shown
+    def getSquareStates(self, animation=None):
+        board = self.g.board if animation is None else animation.board
+        with profiler.section("getHighlights"):
+            highlights = self.getHighlights()
+        return {(row, column): (board[row][column], highlights.get((row, column), ())) for row in range(SQUARES) for column in range(SQUARES)}
+
+    # Returns the row and column of the squares a rect on the board overlaps
+    def getSquaresUnder(self, rect):
+        rows = range(max(rect.top // self.squareSize, 0), min((rect.bottom - 1) // self.squareSize, SQUARES - 1) + 1)
+        columns = range(max(rect.left // self.squareSize, 0), min((rect.right - 1) // self.squareSize, SQUARES - 1) + 1)
+        return [(row, column) for row in rows for column in columns]
+
+    # Adds a move to the animations skipping the oldest waiting ones when moves are made faster than they can be shown
+    def queueAnimation(self, move):
+        self.animations.append(Animation(move, self.g.board))
+        while len(self.animations) > ANIMATIONQUEUESIZE + 1:
+            self.animations.pop(0)
+
+    # Removes finished animations and returns the one being shown or None if there are none
+    def updateAnimations(self, now):
+        while self.animations:
+            animation = self.animations[0]
+            # Starts the animation once the ones before it have finished
+            if animation.startTime is None:
+                animation.start(now)
+            if not animation.isDone(now):
+                return animation
+            self.animations.pop(0)
+        return None
+
+    # Draws a square with its highlights, the ranks and files, and the piece and returns the rect of the square
+    def drawSquare(self, square, state):
+        row, column = square
+        piece, highlights = state
+        squareRect = pygame.Rect(column * self.squareSize, row * self.squareSize, self.squareSize, self.squareSize)
+        # Keeps anything drawn inside the square
+        self.screen.set_clip(squareRect)
+        if highlights:
+            # The plain square is drawn under the highlights so the ranks and files can be drawn on top of them
+            pygame.draw.rect(self.screen, self.boardSquareColor(row, column), squareRect)
+            for color, opacity in highlights:
+                self.drawHightlight(color, opacity, squareRect.topleft, squareRect.size)
+            self.drawRankFiles()
+        else:
+            # Copies the square with its rank and file from the board layer
+            self.screen.blit(self.boardLayer, squareRect, squareRect)
+        # Draws the piece in the square if it is not empty
+        if piece != "--":
+            self.screen.blit(self.images[piece], squareRect)
+        self.screen.set_clip(None)
+        # Remembers what was drawn so the square is only drawn again once it changes
+        self.drawnSquares[square] = state
+        return squareRect
+
+    # Draws the squares and the ranks and files once for the current resolution so they can be copied each frame
+    def buildBoardLayer(self):
         # Iterates through every square on the board
         for row in range(SQUARES):
             for column in range(SQUARES):
                 # Draws the squares evenly throughout the screen switching between colors on odd and even squares
                 pygame.draw.rect(self.screen, self.boardSquareColor(row, column), pygame.Rect(column * self.squareSize, row * self.squareSize, self.squareSize, self.squareSize))
-
-    # Draws pieces on the board using current game
-    def drawPieces(self):
-        try:
-            # Iterates through every square on the board
-            for row in range(SQUARES):
-                for column in range(SQUARES):
-                    # Sets which piece to draw corresponding to where it is in board list
-                    piece = self.g.board[row][column]
-                    # Draws the piece in the corresponding square if it is not empty
-                    if piece != "--":
-                        self.screen.blit(self.images[piece], pygame.Rect(column * self.squareSize, row * self.squareSize, self.squareSize, self.squareSize))
-            # Logs the pieces successully imported on the fx's first call
-            if not self.pieceImport:
-                logging.debug("Piece images imported successfuly")
-                self.pieceImport = True
-        except:
-            logging.critical("Piece images unable to import")
-            logging.critical("Program closing...")
-            pygame.quit()
-            sys.exit(0)
+        # Draws the ranks and files on the board
+        self.drawRankFiles()
+        self.boardLayer = self.screen.copy()
 
     # Draws the numbers and letters on the board
     def drawRankFiles(self):
@@ -535,97 +822,37 @@ class App:
         self.drawText("X - Closes the window", self.displaySize[0] // 24, MENUGRAY, 
                       rect=(self.displaySize[0] // 10, self.displaySize[0] * 17 // 24, self.displaySize[0] - self.displaySize[0] // 10 * 2, self.displaySize[0] * 1 // 16))
 
-    # Highlights the squares selected, possible moves, previous move, and king in check
-    def highlightSquares(self):
+    # Returns the row and column as the key and a tuple of the color and opacity of each highlight as the value for the squares selected, possible moves, previous move, and king in check
+    def getHighlights(self):
+        highlights = {}
         # Checks to see if a king is in check
         if self.g.inCheck():
             # Highlights the king's square red
-            self.drawHightlight(RED, 125, (self.g.whiteKingLocation[1]*self.squareSize if self.g.whitesMove else self.g.blackKingLocation[1]*self.squareSize, self.g.whiteKingLocation[0]*self.squareSize if self.g.whitesMove else self.g.blackKingLocation[0]*self.squareSize), (self.squareSize, self.squareSize))
+            highlights[self.g.whiteKingLocation if self.g.whitesMove else self.g.blackKingLocation] = ((RED, 125),)
         # Checks if move has been made
         if len(self.g.moveHistory) != 0:
             # Uses move history to find last move and highlight those squares
-            self.drawHightlight(CYAN, 125, (self.g.moveHistory[-1].endColumn*self.squareSize, self.g.moveHistory[-1].endRow*self.squareSize), (self.squareSize, self.squareSize))
-            self.drawHightlight(CYAN, 125, (self.g.moveHistory[-1].startColumn*self.squareSize, self.g.moveHistory[-1].startRow*self.squareSize), (self.squareSize, self.squareSize))
+            lastMove = self.g.moveHistory[-1]
+            highlights[(lastMove.endRow, lastMove.endColumn)] = highlights.get((lastMove.endRow, lastMove.endColumn), ()) + ((CYAN, 125),)
+            highlights[(lastMove.startRow, lastMove.startColumn)] = highlights.get((lastMove.startRow, lastMove.startColumn), ()) + ((CYAN, 125),)
         # Makes sure a piece is selected
         if self.squareSelected != ():
             row, column = self.squareSelected
             # Makes sure the correct color piece is selcted depending on whose turn it is
             if self.g.board[row][column][0] == ('w' if self.g.whitesMove else 'b'):
-                # Checks to see if the selected square is the king in check
-                if self.g.inCheck and row == self.g.whiteKingLocation[0] if self.g.whitesMove else self.g.blackKingLocation[0] and column == self.g.whiteKingLocation[1] if self.g.whitesMove else self.g.blackKingLocation[1]:
-                    # Replaces the red check square with the normal gray square in order to be highlighted yellow
-                    self.drawHightlight(self.boardSquareColor(row, column), 255, (column*self.squareSize, row*self.squareSize), (self.squareSize, self.squareSize))
-                # highlights the selected square on the board
-                self.drawHightlight(YELLOW, 125, (column*self.squareSize, row*self.squareSize), (self.squareSize, self.squareSize))
-                # Goes through all the moves 
-                for move in self.validMoves:
-                    # Checks for the moves starting on the selected square
-                    if move.startRow == row and move.startColumn == column:
-                        # Checks if either blue square is a possible move
-                        if len(self.g.moveHistory) != 0 and ((self.g.moveHistory[-1].endColumn, self.g.moveHistory[-1].endRow) == (move.endColumn, move.endRow) or (self.g.moveHistory[-1].startColumn, self.g.moveHistory[-1].startRow) == (move.endColumn, move.endRow)):
-                            # Replaces that square with the normal gray square in order to be highlighted green
-                            self.drawHightlight(self.boardSquareColor(move.endRow, move.endColumn), 255, (move.endColumn*self.squareSize, move.endRow*self.squareSize), (self.squareSize, self.squareSize))
-                        # Draw the possible moves onto the board
-                        self.drawHightlight(GREEN, 125, (move.endColumn*self.squareSize, move.endRow*self.squareSize), (self.squareSize, self.squareSize))
+                # Highlights the selected square yellow in place of the red check highlight
+                highlights[(row, column)] = ((YELLOW, 125),)
+                # Goes through the moves starting on the selected square
+                for move in self.moveIndex.getMovesFrom((row, column)):
+                    # Only one of the moves for each promotion piece is highlighted
+                    if not move.isPawnPromotion or move.promotionPiece == self.g.promotionChoice:
+                        # Highlights the possible moves green in place of the blue previous move highlight
+                        highlights[(move.endRow, move.endColumn)] = ((GREEN, 125),)
+        return highlights
 
     # Draws a colored highlight at a specific location
     def drawHightlight(self, color, opacity, location, surfaceSize):
-        # Initializes highlight layer on the board
-        highlight = pygame.Surface(surfaceSize)
-        # Sets the transparency value
-        highlight.set_alpha(opacity)
-        # Color of the highlighted square
-        highlight.fill(color)
+        # Gets the highlight layer of the size, color, and transparency made the first time it was drawn
+        highlight = self.surfacePool.getSurface(surfaceSize, color, opacity)
         # Draws the highlight onto the board at at the location
         self.screen.blit(highlight, location)
-
-    # Animates the piece moving to its new square
-    def animateMove(self, move):
-        # Change in rows and columns
-        deltaRow = move.endRow - move.startRow
-        deltaColumn = move.endColumn - move.startColumn
-        # Controls animation speed. The lower the number the faster the animation
-        framesPerSquare = 7 if (abs(deltaRow) + abs(deltaColumn)) < 5 else 5
-        # Number of frames for a given animation
-        frameCount = (abs(deltaRow) + abs(deltaColumn)) * framesPerSquare
-        # Iterates through each frame in animation
-        for frame in range(frameCount + 1):
-            # Sets the location the piece should be at a specific frame
-            x, y = ((move.startRow + deltaRow*frame/frameCount, move.startColumn + deltaColumn*frame/frameCount))
-            # Updates the board with piece already moved
-            self.drawBoard()
-            self.drawPieces()
-            # Erases piece at ending square by drawing over its location with a new square
-            endSquare = pygame.Rect(move.endColumn*self.squareSize, move.endRow*self.squareSize, self.squareSize, self.squareSize)
-            pygame.draw.rect(self.screen, self.boardSquareColor(move.endRow, move.endColumn), endSquare)
-            # Checks to see if a move is a castle move
-            if move.isCastle:
-                # Checks to see if the move was to the king or queen's side and sets the distances the rook is located from the king accordingly
-                if move.endColumn - move.startColumn == 2:
-                    endRook = -1
-                    startRook = 1
-                else:
-                    endRook = 1
-                    startRook = -2
-                # Draws over the ending square of the rook with an empty square
-                pygame.draw.rect(self.screen, self.boardSquareColor(move.endRow, move.endColumn+endRook), pygame.Rect((move.endColumn+endRook)*self.squareSize, (move.endRow)*self.squareSize, self.squareSize, self.squareSize))
-                # Draws the rook its starting location
-                self.screen.blit(self.images["wR" if move.pieceMoved[0] == 'w' else "bR"], pygame.Rect((move.endColumn+startRook)*self.squareSize, (move.endRow)*self.squareSize, self.squareSize, self.squareSize))
-            # Draws ranks and files so they do not disappear during the animation
-            self.drawRankFiles()
-            # Checks to see if the end square was not empty
-            if move.pieceCaptured != "--":
-                # Checks to see if the move is an en passant move
-                if move.isEnPassant:
-                    # Moves the captured piece to its original square to be removed
-                    endSquare = pygame.Rect(move.endColumn*self.squareSize, (move.endRow + 1 if move.pieceMoved == 'wP' else move.endRow - 1)*self.squareSize, self.squareSize, self.squareSize)
-                    self.screen.blit(self.images[move.pieceCaptured], endSquare)
-                else:
-                    # Draws the piece at the ending square
-                    self.screen.blit(self.images[move.pieceCaptured], endSquare)
-            # Displays moved piece at current frame in animation
-            self.screen.blit(self.images[move.pieceMoved], pygame.Rect(int(y*self.squareSize), int(x*self.squareSize), self.squareSize, self.squareSize))
-            # Displays animation on screen
-            pygame.display.update()
-            # Controls frame rate of animation
-            self.clock.tick(60)
\ No newline at end of file
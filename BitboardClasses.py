@@ -0,0 +1,286 @@
+""" This file stores the bitboard game class which keeps the board as 64 bit integers for faster move generation """
+
+from Constants import *
+from GameClasses import *
+
+# Squares are numbered 0 - 63 from the top left of the board list so a square is row * 8 + column
+# Directions a rook or bishop slides in with whether the square number increases along the direction
+SLIDINGDIRECTIONS = tuple((d, d[0] > 0 or (d[0] == 0 and d[1] > 0)) for d in ROOKDIRECTIONS + BISHOPDIRECTIONS)
+
+
+# Builds a table of the squares reached from every square by a list of single steps
+def buildStepAttacks(directions):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        attacks = 0
+        for d in directions:
+            if 0 <= row + d[0] < 8 and 0 <= column + d[1] < 8:
+                attacks |= 1 << ((row + d[0]) * 8 + column + d[1])
+        table.append(attacks)
+    return table
+
+# Builds a table of every square along a direction from every square on an empty board
+def buildRays(direction):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        ray = 0
+        for i in range(1, 8):
+            if not (0 <= row + direction[0] * i < 8 and 0 <= column + direction[1] * i < 8):
+                break
+            ray |= 1 << ((row + direction[0] * i) * 8 + column + direction[1] * i)
+        table.append(ray)
+    return table
+
+# Precomputed squares attacked by knights and kings from every square
+KNIGHTATTACKS = buildStepAttacks(KNIGHTDIRECTIONS)
+KINGATTACKS = buildStepAttacks(KINGDIRECTIONS)
+# Precomputed squares attacked by pawns of each color from every square
+PAWNATTACKS = {'w': buildStepAttacks(((-1, -1), (-1, 1))), 'b': buildStepAttacks(((1, -1), (1, 1)))}
+# Precomputed rays in every sliding direction from every square
+RAYS = {d: buildRays(d) for d in ROOKDIRECTIONS + BISHOPDIRECTIONS}
+# Every square a queen could reach from a square on an empty board, used to find pieces that could be pinned
+QUEENRAYS = [sum(RAYS[d][square] for d in ROOKDIRECTIONS + BISHOPDIRECTIONS) for square in range(64)]
+
+# Returns the squares attacked by a sliding piece in the given directions stopping at the first piece in each direction
+def slidingAttacks(square, occupied, directions):
+    attacks = 0
+    for d, increasing in directions:
+        ray = RAYS[d][square]
+        blockers = ray & occupied
+        if blockers:
+            # The closest blocker is the lowest square number when the direction increases and the highest otherwise
+            blocker = (blockers & -blockers).bit_length() - 1 if increasing else blockers.bit_length() - 1
+            # Removes the squares behind the blocker
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+# Sliding directions split between the rook and the bishop
+ROOKSLIDES = SLIDINGDIRECTIONS[:4]
+BISHOPSLIDES = SLIDINGDIRECTIONS[4:]
+
+
+# Game which keeps one bitboard for each piece and color and generates moves from them
+class BitboardGame(Game):
+    def __init__(self):
+        super().__init__()
+        # Piece name as the key and a 64 bit integer with a bit set for every square the piece is on as the value
+        self.pieceBitboards = {}
+        # Color as the key and a 64 bit integer of every square that color occupies as the value
+        self.occupancy = {}
+        # Sets the bitboards from the starting board
+        self.setBitboardsFromBoard()
+
+    # Sets every bitboard from the list of strings board
+    def setBitboardsFromBoard(self):
+        self.pieceBitboards = {color + piece: 0 for color in "wb" for piece in "PRNBQK"}
+        for row in range(8):
+            for column in range(8):
+                if self.board[row][column] != "--":
+                    self.pieceBitboards[self.board[row][column]] |= 1 << (row * 8 + column)
+        self.updateOccupancy()
+
+    # Sets up a position on the board then sets the bitboards from it
+    def setPosition(self, board, whitesMove, castleRight, enPassantPossible=(), halfmoveClock=0, fullmoveNumber=1):
+        super().setPosition(board, whitesMove, castleRight, enPassantPossible, halfmoveClock, fullmoveNumber)
+        self.setBitboardsFromBoard()
+
+    # Recalculates the occupancy of each color from the piece bitboards
+    def updateOccupancy(self):
+        bitboards = self.pieceBitboards
+        self.occupancy['w'] = bitboards['wP'] | bitboards['wR'] | bitboards['wN'] | bitboards['wB'] | bitboards['wQ'] | bitboards['wK']
+        self.occupancy['b'] = bitboards['bP'] | bitboards['bR'] | bitboards['bN'] | bitboards['bB'] | bitboards['bQ'] | bitboards['bK']
+
+    # Builds the list of strings board from the bitboards. Used to check the bitboards match the board
+    def getBoardFromBitboards(self):
+        board = [["--"] * 8 for row in range(8)]
+        for piece, bitboard in self.pieceBitboards.items():
+            while bitboard:
+                bit = bitboard & -bitboard
+                square = bit.bit_length() - 1
+                board[square // 8][square % 8] = piece
+                bitboard ^= bit
+        return board
+
+
+    """ Game Update Functions """
+    # Makes the move on the board then moves the same pieces on the bitboards
+    def makeMove(self, move):
+        super().makeMove(move)
+        # The piece on the ending square is the new piece after a pawn promotion
+        self.toggleMoveBits(move, self.board[move.endRow][move.endColumn])
+
+    # Undoes the last move on the bitboards then on the board
+    def undoMove(self):
+        if len(self.moveHistory) != 0:
+            move = self.moveHistory[-1]
+            # Toggling the same bits again puts the pieces back
+            self.toggleMoveBits(move, self.board[move.endRow][move.endColumn])
+            super().undoMove()
+
+    # Flips the bits of every square a move changes. Calling it twice with the same move restores the bitboards
+    def toggleMoveBits(self, move, pieceEnded):
+        bitboards = self.pieceBitboards
+        # Removes the piece from its starting square and places the piece it ends as on the ending square
+        bitboards[move.pieceMoved] ^= 1 << (move.startRow * 8 + move.startColumn)
+        bitboards[pieceEnded] ^= 1 << (move.endRow * 8 + move.endColumn)
+        # Removes the captured piece which is beside the starting square for en passant
+        if move.pieceCaptured != "--":
+            captureRow = move.startRow if move.isEnPassant else move.endRow
+            bitboards[move.pieceCaptured] ^= 1 << (captureRow * 8 + move.endColumn)
+        # Moves the rook to the other side of the king for castle moves
+        if move.isCastle:
+            if move.endColumn - move.startColumn == 2:
+                rookStart, rookEnd = move.endColumn + 1, move.endColumn - 1
+            else:
+                rookStart, rookEnd = move.endColumn - 2, move.endColumn + 1
+            bitboards[move.pieceMoved[0] + 'R'] ^= (1 << (move.endRow * 8 + rookStart)) | (1 << (move.endRow * 8 + rookEnd))
+        self.updateOccupancy()
+
+
+    """ Move Generation Functions """
+    # Generates all legal moves from the bitboards. Replaces the list board version used when useAttackMap is True
+    def getAttackMapMoves(self):
+        moves = []
+        bitboards = self.pieceBitboards
+        allyColor = 'w' if self.whitesMove else 'b'
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy['b' if self.whitesMove else 'w']
+        occupied = own | enemy
+        kingRow, kingColumn = self.whiteKingLocation if self.whitesMove else self.blackKingLocation
+        kingSquare = kingRow * 8 + kingColumn
+        # Finds the squares a piece may move to while the king is in check and the line each pinned piece must stay on
+        checkMask, pinMasks = self.getCheckAndPinMasks(kingSquare, own, occupied)
+
+        # Adds a move to every target square as an object of the Move class
+        def addMoves(startSquare, targets):
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                moves.append(Move(divmod(startSquare, 8), divmod(bit.bit_length() - 1, 8), self.board))
+
+        # Only the king can move out of a double check
+        if checkMask:
+            # Knights, bishops, rooks, and queens can move to any attacked square not occupied by an allied piece
+            for piece, directions in (('N', None), ('B', BISHOPSLIDES), ('R', ROOKSLIDES), ('Q', SLIDINGDIRECTIONS)):
+                pieces = bitboards[allyColor + piece]
+                while pieces:
+                    bit = pieces & -pieces
+                    pieces ^= bit
+                    square = bit.bit_length() - 1
+                    attacks = KNIGHTATTACKS[square] if directions is None else slidingAttacks(square, occupied, directions)
+                    addMoves(square, attacks & ~own & checkMask & pinMasks.get(square, -1))
+            # Pawn moves
+            self.getPawnBitboardMoves(moves, allyColor, enemy, occupied, kingSquare, checkMask, pinMasks)
+        # The king can move to any adjacent square not occupied by an allied piece or attacked. The king is removed so it cannot step back along a checking line
+        targets = KINGATTACKS[kingSquare] & ~own
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            if not self.isAttacked(bit.bit_length() - 1, occupied & ~(1 << kingSquare), bit):
+                moves.append(Move((kingRow, kingColumn), divmod(bit.bit_length() - 1, 8), self.board))
+        # Castle moves are checked with the bitboard version of squareUnderAttack when the king is not in check
+        if checkMask == -1:
+            self.getCastleMoves(kingRow, kingColumn, moves)
+        # Returns list of every legal move as an object of the Move class
+        return moves
+
+    # Finds the squares that capture or block a check and a mask of the line each pinned piece is able to move along
+    def getCheckAndPinMasks(self, kingSquare, own, occupied):
+        bitboards = self.pieceBitboards
+        allyColor = 'w' if self.whitesMove else 'b'
+        enemyColor = 'b' if self.whitesMove else 'w'
+        # Every square is allowed when the king is not in check
+        checkMask = -1
+        checks = 0
+        # Pinned piece's square as the key and the squares from the king up to the pinning piece as the value
+        pinMasks = {}
+        # Knights and pawns giving check can only be captured
+        checkers = (KNIGHTATTACKS[kingSquare] & bitboards[enemyColor + 'N']) | (PAWNATTACKS[allyColor][kingSquare] & bitboards[enemyColor + 'P'])
+        if checkers:
+            checkMask = checkers
+            checks = bin(checkers).count("1")
+        # Looks along every line from the king for a rook, bishop, or queen
+        for d, increasing in SLIDINGDIRECTIONS:
+            sliders = bitboards[enemyColor + 'Q'] | bitboards[enemyColor + ('R' if d in ROOKDIRECTIONS else 'B')]
+            ray = RAYS[d][kingSquare]
+            if not ray & sliders:
+                continue
+            blockers = ray & occupied
+            first = (blockers & -blockers).bit_length() - 1 if increasing else blockers.bit_length() - 1
+            # The closest piece is an enemy that can attack along the line so the king is in check
+            if (sliders >> first) & 1:
+                checkMask = (ray ^ RAYS[d][first]) if checks == 0 else 0
+                checks += 1
+            # The closest piece is allied and is pinned if the next piece along the line can attack the king
+            elif (own >> first) & 1:
+                blockers &= RAYS[d][first]
+                if blockers:
+                    second = (blockers & -blockers).bit_length() - 1 if increasing else blockers.bit_length() - 1
+                    if (sliders >> second) & 1:
+                        pinMasks[first] = ray ^ RAYS[d][second]
+        # Nothing can be blocked or captured to get out of a double check
+        if checks > 1:
+            checkMask = 0
+        return checkMask, pinMasks
+
+    # Generates the legal pawn moves from the bitboards and adds them to moves list
+    def getPawnBitboardMoves(self, moves, allyColor, enemy, occupied, kingSquare, checkMask, pinMasks):
+        # Sets variables for the white or black pawns' moves
+        if allyColor == 'w':
+            step, startingRow, endingRow = -8, 6, 0
+        else:
+            step, startingRow, endingRow = 8, 1, 7
+        enPassantBit = 1 << (self.enPassantPossible[0] * 8 + self.enPassantPossible[1]) if self.enPassantPossible != () else 0
+        pawns = self.pieceBitboards[allyColor + 'P']
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            square = bit.bit_length() - 1
+            row = square // 8
+            # Squares the pawn could move to before checks and pins are considered
+            targets = 0
+            # One square forward and two squares forward from the starting row
+            if not (occupied >> (square + step)) & 1:
+                targets |= 1 << (square + step)
+                if row == startingRow and not (occupied >> (square + step * 2)) & 1:
+                    targets |= 1 << (square + step * 2)
+            # Diagonal captures
+            targets |= PAWNATTACKS[allyColor][square] & enemy
+            targets &= checkMask & pinMasks.get(square, -1)
+            while targets:
+                targetBit = targets & -targets
+                targets ^= targetBit
+                endSquare = targetBit.bit_length() - 1
+                self.addPawnMoves((row, square % 8), divmod(endSquare, 8), moves, endSquare // 8 == endingRow)
+            # En passant removes a pawn beside the starting square so the king's square is checked as the board would be after the move
+            if PAWNATTACKS[allyColor][square] & enPassantBit:
+                endSquare = enPassantBit.bit_length() - 1
+                capturedBit = 1 << (endSquare - step)
+                if not self.isAttacked(kingSquare, (occupied & ~bit & ~capturedBit) | enPassantBit, capturedBit):
+                    moves.append(Move((row, square % 8), divmod(endSquare, 8), self.board, isEnPassant=True))
+
+    # Determines if the enemy attacks a square for a given occupancy, ignoring any enemy piece on the removed squares
+    def isAttacked(self, square, occupied, removed):
+        bitboards = self.pieceBitboards
+        enemyColor = 'b' if self.whitesMove else 'w'
+        allyColor = 'w' if self.whitesMove else 'b'
+        # Looks outwards from the square with each piece's attacks for the same enemy piece
+        if KNIGHTATTACKS[square] & bitboards[enemyColor + 'N'] & ~removed:
+            return True
+        if PAWNATTACKS[allyColor][square] & bitboards[enemyColor + 'P'] & ~removed:
+            return True
+        if KINGATTACKS[square] & bitboards[enemyColor + 'K']:
+            return True
+        queens = bitboards[enemyColor + 'Q']
+        if slidingAttacks(square, occupied, ROOKSLIDES) & (bitboards[enemyColor + 'R'] | queens) & ~removed:
+            return True
+        if slidingAttacks(square, occupied, BISHOPSLIDES) & (bitboards[enemyColor + 'B'] | queens) & ~removed:
+            return True
+        return False
+
+    # Determines if the enemy can attack a certain location using the bitboards
+    def squareUnderAttack(self, row, column):
+        return self.isAttacked(row * 8 + column, self.occupancy['w'] | self.occupancy['b'], 0)
@@ -5,6 +5,35 @@ SQUARES = 8
 
 # Frames per second
 FPS = 30
+# Milliseconds the window waits for an event before checking for changes when nothing is happening
+IDLETIMEOUT = 1000
+# Frames per second while a move is animated
+ANIMATIONFPS = 60
+# Number of animations that can wait for the one being shown. Older ones are skipped when moves are made faster than they can be animated
+ANIMATIONQUEUESIZE = 1
+
+# Number of rendered text surfaces kept before the least recently used is removed
+TEXTCACHESIZE = 256
+# Number of square sizes the piece images are kept scaled to before the least recently used is removed
+SPRITECACHESIZE = 3
+
+# File the game is logged to and file the record of each move is logged to as lines of JSON
+LOGFILE = "GameLog.txt"
+MOVELOGFILE = "MoveLog.jsonl"
+# Size in bytes a log file can reach before it is renamed and a new one started, and how many renamed files are kept
+LOGMAXBYTES = 1048576
+LOGBACKUPCOUNT = 3
+# Number of move records kept before they are written together
+MOVELOGBATCHSIZE = 32
+
+# Number of recent times the profiler keeps for each section
+PROFILERWINDOW = 600
+# Seconds between updates of the profiler times drawn on screen
+PROFILERREFRESH = 0.25
+# File the profiler saves its times to when the program closes
+PROFILEFILE = "Profile.json"
+# Upper limit in milliseconds of each bucket in the profiler's histograms
+PROFILERBUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -18,7 +47,79 @@ CYAN = (0, 255 ,255)
 MENUGRAY = (85, 90, 100)
 
 
+# Number of times a position must be reached for the game to be drawn by repetition
+REPETITIONLIMIT = 3
+# Number of moves by both players without a capture or pawn move after which the game is drawn by the fifty move rule
+FIFTYMOVELIMIT = 100
+
+# FEN string of the starting position
+STARTFEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
 # Converts the board indexes of the rows to standard chess notation as number 1 - 8
 ROWSTORANKS = ('8', '7', '6', '5', '4', '3', '2', '1')
 # Converts the board indexes of the columns to standard chess notation as letters a - h
-COLUMNSTOFILES = ('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h')
\ No newline at end of file
+COLUMNSTOFILES = ('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h')
+
+# Directions a rook can slide in (up, left, down, right)
+ROOKDIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+# Directions a bishop can slide in (up left, up right, down left, down right)
+BISHOPDIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+# Squares a knight can jump to relative to its location
+KNIGHTDIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+# Squares a king can step to relative to its location
+KINGDIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+# Pieces a pawn can be promoted to
+PROMOTIONPIECES = ('Q', 'R', 'B', 'N')
+
+# Value of each piece in centipawns used to evaluate a position
+PIECEVALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+# Bonus for each piece on each square from white's side of the board with row 0 being rank 8. Black uses the rows in reverse
+PIECESQUARETABLES = {
+    'P': ((0, 0, 0, 0, 0, 0, 0, 0),
+          (50, 50, 50, 50, 50, 50, 50, 50),
+          (10, 10, 20, 30, 30, 20, 10, 10),
+          (5, 5, 10, 25, 25, 10, 5, 5),
+          (0, 0, 0, 20, 20, 0, 0, 0),
+          (5, -5, -10, 0, 0, -10, -5, 5),
+          (5, 10, 10, -20, -20, 10, 10, 5),
+          (0, 0, 0, 0, 0, 0, 0, 0)),
+    'N': ((-50, -40, -30, -30, -30, -30, -40, -50),
+          (-40, -20, 0, 0, 0, 0, -20, -40),
+          (-30, 0, 10, 15, 15, 10, 0, -30),
+          (-30, 5, 15, 20, 20, 15, 5, -30),
+          (-30, 0, 15, 20, 20, 15, 0, -30),
+          (-30, 5, 10, 15, 15, 10, 5, -30),
+          (-40, -20, 0, 5, 5, 0, -20, -40),
+          (-50, -40, -30, -30, -30, -30, -40, -50)),
+    'B': ((-20, -10, -10, -10, -10, -10, -10, -20),
+          (-10, 0, 0, 0, 0, 0, 0, -10),
+          (-10, 0, 5, 10, 10, 5, 0, -10),
+          (-10, 5, 5, 10, 10, 5, 5, -10),
+          (-10, 0, 10, 10, 10, 10, 0, -10),
+          (-10, 10, 10, 10, 10, 10, 10, -10),
+          (-10, 5, 0, 0, 0, 0, 5, -10),
+          (-20, -10, -10, -10, -10, -10, -10, -20)),
+    'R': ((0, 0, 0, 0, 0, 0, 0, 0),
+          (5, 10, 10, 10, 10, 10, 10, 5),
+          (-5, 0, 0, 0, 0, 0, 0, -5),
+          (-5, 0, 0, 0, 0, 0, 0, -5),
+          (-5, 0, 0, 0, 0, 0, 0, -5),
+          (-5, 0, 0, 0, 0, 0, 0, -5),
+          (-5, 0, 0, 0, 0, 0, 0, -5),
+          (0, 0, 0, 5, 5, 0, 0, 0)),
+    'Q': ((-20, -10, -10, -5, -5, -10, -10, -20),
+          (-10, 0, 0, 0, 0, 0, 0, -10),
+          (-10, 0, 5, 5, 5, 5, 0, -10),
+          (-5, 0, 5, 5, 5, 5, 0, -5),
+          (0, 0, 5, 5, 5, 5, 0, -5),
+          (-10, 5, 5, 5, 5, 5, 0, -10),
+          (-10, 0, 5, 0, 0, 0, 0, -10),
+          (-20, -10, -10, -5, -5, -10, -10, -20)),
+    'K': ((-30, -40, -40, -50, -50, -40, -40, -30),
+          (-30, -40, -40, -50, -50, -40, -40, -30),
+          (-30, -40, -40, -50, -50, -40, -40, -30),
+          (-30, -40, -40, -50, -50, -40, -40, -30),
+          (-20, -30, -30, -40, -40, -30, -30, -20),
+          (-10, -20, -20, -20, -20, -20, -20, -10),
+          (20, 20, 0, 0, 0, 0, 20, 20),
+          (20, 30, 10, 0, 0, 10, 30, 20))}
@@ -0,0 +1,252 @@
+""" This file stores the engine class which searches for the best move for the computer player """
+
+import time
+import logging
+import threading
+
+from Constants import *
+from GameClasses import *
+
+# Score of a checkmate. Checkmates found in fewer moves score higher
+MATESCORE = 100000
+# Score higher than any position can have
+INFINITY = 1000000
+
+
+# Raised inside the search once the time or node limit is reached so the search can stop at any depth
+class StopSearch(Exception):
+    pass
+
+
+# Stores the outcome of a search
+class SearchResult:
+    def __init__(self):
+        # Best move found as an object of the Move class or None if there are no legal moves
+        self.bestMove = None
+        # List of the best moves for both players expected to follow, starting with bestMove
+        self.pv = []
+        # Score of the position in centipawns for the player whose turn it is
+        self.score = 0
+        # Deepest search that finished
+        self.depth = 0
+        # Number of positions searched
+        self.nodes = 0
+        # Time spent searching in seconds
+        self.seconds = 0.0
+
+
+# Runs a search on a copy of the game in a background thread so the window keeps responding while the engine thinks
+class SearchJob:
+    def __init__(self, engine, game, maxDepth=None, timeLimit=None, nodeLimit=None, onDone=None):
+        # Engine that runs the search. It should not be used by anything else until the job is done
+        self.engine = engine
+        # The game is copied so the board being drawn is never changed by the search
+        self.game = game.copy()
+        # Limits passed to Engine.search
+        self.limits = {"maxDepth": maxDepth, "timeLimit": timeLimit, "nodeLimit": nodeLimit}
+        # Set by cancel to stop the search
+        self.stopEvent = threading.Event()
+        # SearchResult once the search is done, or None if it failed or has not finished
+        self.result = None
+        # Set once the search has finished or was stopped
+        self.doneEvent = threading.Event()
+        # Function called from the search thread once the search is done, used to wake up a waiting loop
+        self.onDone = onDone
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # Searches the copied game and stores the result
+    def run(self):
+        try:
+            self.result = self.engine.search(self.game, stopEvent=self.stopEvent, **self.limits)
+        except Exception:
+            # The result is left as None so the game can carry on without the search
+            logging.exception("Search failed")
+        finally:
+            self.doneEvent.set()
+            if self.onDone is not None:
+                self.onDone()
+
+    # Determines if the search has finished or was stopped
+    def isDone(self):
+        return self.doneEvent.is_set()
+
+    # Stops the search. The result is the best move from the last depth finished if there was one
+    def cancel(self):
+        self.stopEvent.set()
+
+
+# Searches for the best move using negamax alpha-beta with iterative deepening
+class Engine:
+    def __init__(self, maxDepth=64, timeLimit=1.0, nodeLimit=None):
+        # Deepest search that will be started
+        self.maxDepth = maxDepth
+        # Seconds a search is allowed to take, or None for no limit
+        self.timeLimit = timeLimit
+        # Number of positions a search is allowed to visit, or None for no limit
+        self.nodeLimit = nodeLimit
+        # Keeps track of the positions searched and when the search started
+        self.nodes = 0
+        self.startTime = 0.0
+        # Limits of the search currently running
+        self.searchTimeLimit = timeLimit
+        self.searchNodeLimit = nodeLimit
+        # Event that stops the search currently running when it is set, or None if it can only be stopped by the limits
+        self.stopEvent = None
+        # Stops the limits from ending the search before the first depth has finished so there is always a move
+        self.limitsActive = False
+        # Two quiet moves for each ply that caused a beta cutoff
+        self.killerMoves = []
+        # Move key as the key and a score that grows every time the quiet move causes a beta cutoff as the value
+        self.history = {}
+        # Principal variation of the last finished depth. It is searched first at the next depth
+        self.previousPV = []
+
+    # Searches the game and returns a SearchResult. The limits given override the ones the engine was created with and setting stopEvent stops the search early
+    def search(self, game, maxDepth=None, timeLimit=None, nodeLimit=None, stopEvent=None):
+        maxDepth = self.maxDepth if maxDepth is None else maxDepth
+        self.stopEvent = stopEvent
+        self.searchTimeLimit = self.timeLimit if timeLimit is None else timeLimit
+        self.searchNodeLimit = self.nodeLimit if nodeLimit is None else nodeLimit
+        result = SearchResult()
+        self.nodes = 0
+        self.startTime = time.perf_counter()
+        self.limitsActive = False
+        self.killerMoves = [[None, None] for ply in range(maxDepth + 1)]
+        self.history = {}
+        self.previousPV = []
+        # Keeps track of how many moves were made before the search so a stopped search can undo back to it
+        rootLength = len(game.moveHistory)
+        for depth in range(1, maxDepth + 1):
+            pv = []
+            try:
+                score = self.negamax(game, depth, -INFINITY, INFINITY, 0, pv)
+            except StopSearch:
+                # Undoes the moves made by the unfinished search
+                while len(game.moveHistory) > rootLength:
+                    game.undoMove()
+                break
+            # The game has no legal moves
+            if not pv:
+                break
+            result.bestMove = pv[0]
+            result.pv = pv
+            result.score = score
+            result.depth = depth
+            self.previousPV = pv
+            self.limitsActive = True
+            # No deeper search can find a faster checkmate
+            if abs(score) >= MATESCORE - depth:
+                break
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - self.startTime
+        # Sets checkmate and stalemate back for the position searched from
+        game.getValidMoves()
+        return result
+
+    # Raises StopSearch once the search is stopped or the time or node limit has been passed
+    def checkLimits(self):
+        self.nodes += 1
+        # A stopped search ends even before the first depth has finished
+        if self.stopEvent is not None and self.nodes % 256 == 0 and self.stopEvent.is_set():
+            raise StopSearch()
+        if not self.limitsActive:
+            return
+        if self.searchNodeLimit is not None and self.nodes >= self.searchNodeLimit:
+            raise StopSearch()
+        # Checks the time every 256 positions since getting the time is slow compared to a node
+        if self.searchTimeLimit is not None and self.nodes % 256 == 0 and time.perf_counter() - self.startTime >= self.searchTimeLimit:
+            raise StopSearch()
+
+    # Returns the best score for the player whose turn it is and fills pv with the moves that lead to it
+    def negamax(self, game, depth, alpha, beta, ply, pv):
+        self.checkLimits()
+        # Positions drawn by repetition, the fifty move rule, or insufficient material score 0 below the position searched from
+        if ply > 0 and game.getDrawReason() is not None:
+            return 0
+        if depth == 0:
+            return self.quiescence(game, alpha, beta)
+        moves = game.getValidMoves()
+        # Checkmate is scored higher the fewer moves it takes and stalemate is a draw
+        if len(moves) == 0:
+            return -MATESCORE + ply if game.checkmate else 0
+        self.orderMoves(moves, ply)
+        bestScore = -INFINITY
+        for move in moves:
+            childPV = []
+            game.makeMove(move)
+            score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1, childPV)
+            game.undoMove()
+            if score > bestScore:
+                bestScore = score
+            if score > alpha:
+                alpha = score
+                pv[:] = [move] + childPV
+                if alpha >= beta:
+                    # Remembers quiet moves that caused a cutoff to try them first in other positions
+                    if move.pieceCaptured == "--" and not move.isPawnPromotion:
+                        key = self.getMoveKey(move)
+                        if self.killerMoves[ply][0] != key:
+                            self.killerMoves[ply][1] = self.killerMoves[ply][0]
+                            self.killerMoves[ply][0] = key
+                        self.history[key] = self.history.get(key, 0) + depth * depth
+                    break
+        return bestScore
+
+    # Searches only captures and promotions until the position is quiet so the evaluation is not made in the middle of an exchange
+    def quiescence(self, game, alpha, beta):
+        self.checkLimits()
+        # The player can choose not to capture so the evaluation is the lowest the score can be
+        standPat = self.evaluate(game)
+        if standPat >= beta:
+            return standPat
+        if standPat > alpha:
+            alpha = standPat
+        moves = [move for move in game.getValidMoves() if move.pieceCaptured != "--" or (move.isPawnPromotion and move.promotionPiece == 'Q')]
+        self.orderMoves(moves, None)
+        for move in moves:
+            game.makeMove(move)
+            score = -self.quiescence(game, -beta, -alpha)
+            game.undoMove()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    # Sorts the moves so the ones most likely to be best are searched first which lets alpha-beta skip more positions
+    def orderMoves(self, moves, ply):
+        pvKey = self.getMoveKey(self.previousPV[ply]) if ply is not None and ply < len(self.previousPV) else None
+        killers = self.killerMoves[ply] if ply is not None and ply < len(self.killerMoves) else (None, None)
+
+        # Gives a move a higher score the earlier it should be searched
+        def moveScore(move):
+            key = self.getMoveKey(move)
+            # The move from the last depth's principal variation is searched first
+            if key == pvKey:
+                return 3 * INFINITY
+            score = 0
+            # Captures are ordered by most valuable victim then least valuable attacker
+            if move.pieceCaptured != "--":
+                score += 2 * INFINITY + PIECEVALUES[move.pieceCaptured[1]] * 10 - PIECEVALUES[move.pieceMoved[1]]
+            if move.isPawnPromotion:
+                score += 2 * INFINITY + PIECEVALUES[move.promotionPiece]
+            if score:
+                return score
+            # Quiet moves that caused cutoffs at the same ply, then quiet moves by how often they caused cutoffs
+            if key == killers[0]:
+                return INFINITY + 1
+            if key == killers[1]:
+                return INFINITY
+            return self.history.get(key, 0)
+
+        moves.sort(key=moveScore, reverse=True)
+
+    # Returns a value that identifies a move. The move ID includes the piece a pawn is promoted to
+    @staticmethod
+    def getMoveKey(move):
+        return move.moveID
+
+    # Scores the position in centipawns for the player whose turn it is from the material and piece square scores the game keeps updated
+    def evaluate(self, game):
+        return game.getEvaluation()
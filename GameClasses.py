@@ -1,7 +1,22 @@
 """ This file stores the game, castle, and move classes which control piece movement and locations """
 
+import copy
+import random
+from collections import OrderedDict
+
 from Constants import *
 
+# Random 64 bit numbers used to build a key for each position. A fixed seed gives the same keys every run
+zobristRandom = random.Random(1)
+# Piece name as the key and a number for every row and column as the value
+ZOBRISTPIECES = {color + piece: [[zobristRandom.getrandbits(64) for column in range(8)] for row in range(8)] for color in "wb" for piece in "PRNBQK"}
+# Added to the key when it is black's turn
+ZOBRISTBLACKTOMOVE = zobristRandom.getrandbits(64)
+# A number for each combination of castle rights using the index from Castle.getIndex
+ZOBRISTCASTLE = [zobristRandom.getrandbits(64) for index in range(16)]
+# A number for each column en passant is possible on
+ZOBRISTENPASSANT = [zobristRandom.getrandbits(64) for column in range(8)]
+
 # Stores information about the board and piece movement
 class Game:
     def __init__(self):
@@ -34,12 +49,45 @@ class Game:
         self.enPassantPossible = ()
         # Keeps track of en passant possible for the previous moves
         self.enPassantPossibleLog = []
-        # Keeps track of what piece the pawn will change to. Currently, it will only change to a queen without a choice for another piece
+        # Number of moves since the last capture or pawn move, used for the fifty move rule
+        self.halfmoveClock = 0
+        # Number of the current move starting at 1 and going up after every black move
+        self.fullmoveNumber = 1
+        # Keeps track of the halfmove clock and fullmove number before each move so they can be set back when a move is undone
+        self.moveCounterLog = []
+        # Keeps track of what piece the pawn will change to when a player promotes a pawn. A move is generated for every piece and this picks which one is made
         self.promotionChoice = 'Q'
         # Keeps track of if castling can occur and where making sure the kings and rooks have not moved
         self.castleRight = Castle(True, True, True, True)
         # Keeps track of whether a move changed castleRight
         self.castleLog = [Castle(self.castleRight.wks, self.castleRight.bks, self.castleRight.wqs, self.castleRight.bqs)]
+        # Keeps track of whether legal moves are found from pins, checks, and attacked squares or by making and undoing every move
+        self.useAttackMap = True
+        # Zobrist key of the pieces, castle rights, and en passant column. Whose turn it is is added by getPositionKey so whitesMove can be changed before a game starts
+        self.zobristKey = self.computeZobristKey()
+        # Keeps track of the zobrist key after every move so it can be set back when a move is undone
+        self.zobristLog = [self.zobristKey]
+        # Repetition key as the key and the number of times the position has been reached as the value, used for draws by repetition
+        self.repetitionCounts = {self.getRepetitionKey(): 1}
+        # Position key as the key and the legal moves, checkmate, and stalemate as the value, ordered from least to most recently used
+        self.moveCache = OrderedDict()
+        # Maximum number of positions stored in moveCache. Each position holds around 30 moves so 1024 positions is a few megabytes. 0 turns the cache off
+        self.moveCacheSize = 1024
+        # Keeps track of how many times the legal moves were found in moveCache or had to be generated
+        self.moveCacheHits = 0
+        self.moveCacheMisses = 0
+        # Legal moves grouped by square for the position with the key moveIndexKey. Only built when getMoveIndex is called so searches do not pay for it
+        self.moveIndex = None
+        self.moveIndexKey = None
+        # Color as the key and the total value of that color's pieces as the value
+        self.materialScore = {'w': 0, 'b': 0}
+        # Color as the key and the total piece square table bonus of that color's pieces as the value
+        self.pieceSquareScore = {'w': 0, 'b': 0}
+        self.setEvaluationScores()
+        # Keeps track of the white and black material and piece square scores after every move so they can be set back when a move is undone
+        self.evaluationLog = [(self.materialScore['w'], self.materialScore['b'], self.pieceSquareScore['w'], self.pieceSquareScore['b'])]
+        # Piece name as the key and the number of those pieces on the board as the value, and the number of bishops on light and dark squares. Used for draws by insufficient material
+        self.pieceCounts, self.bishopSquareCounts = self.computePieceCounts()
 
 
     """ Game Update Functions """
@@ -61,9 +109,14 @@ class Game:
         # Check for a pawn promotion
         if move.isPawnPromotion:
             # Changes the pawn to a new piece
-            self.board[move.endRow][move.endColumn] = move.pieceMoved[0] + self.promotionChoice
+            self.board[move.endRow][move.endColumn] = move.pieceMoved[0] + move.promotionPiece
         # Adds en passant possible to the log of possible locations
         self.enPassantPossibleLog.append(self.enPassantPossible)
+        # Adds the move counters to their log then updates them. The halfmove clock starts again after a capture or pawn move
+        self.moveCounterLog.append((self.halfmoveClock, self.fullmoveNumber))
+        self.halfmoveClock = 0 if move.pieceCaptured != "--" or move.pieceMoved[1] == 'P' else self.halfmoveClock + 1
+        if move.pieceMoved[0] == 'b':
+            self.fullmoveNumber += 1
         # Check for en passant move
         if move.isEnPassant:
             # Captures the pawn
@@ -92,11 +145,26 @@ class Game:
         self.updateCastleRights(move)
         # Adds the new castle rights to the log
         self.castleLog.append(Castle(self.castleRight.wks, self.castleRight.bks, self.castleRight.wqs, self.castleRight.bqs))
+        # Updates the zobrist key for only the squares and rights the move changed
+        self.updateZobristKey(move)
+        # Updates the material and piece square scores for only the pieces the move changed
+        self.updateEvaluationScores(move)
+        # Updates the piece counts for a captured piece or a promoted pawn
+        self.updatePieceCounts(move, 1)
+        # Counts the position reached for draws by repetition
+        key = self.getRepetitionKey()
+        self.repetitionCounts[key] = self.repetitionCounts.get(key, 0) + 1
 
     # Undoes the last move. Reverse of makeMove fx
     def undoMove(self):
         # Makes sure a move is available to be undone
         if len(self.moveHistory) != 0:
+            # Removes the count of the position being left before the move is undone
+            key = self.getRepetitionKey()
+            if self.repetitionCounts[key] > 1:
+                self.repetitionCounts[key] -= 1
+            else:
+                del self.repetitionCounts[key]
             # Removes the last move from the history list and stores it in a move variable
             move = self.moveHistory.pop()
             # Replaces the starting position with the piece
@@ -118,11 +186,21 @@ class Game:
                 self.board[move.startRow][move.endColumn] = move.pieceCaptured
             # Sets en passant possible back to the previous move
             self.enPassantPossible = self.enPassantPossibleLog.pop()
+            # Sets the move counters back to the previous move
+            self.halfmoveClock, self.fullmoveNumber = self.moveCounterLog.pop()
             # Removes last value for castleLog
             self.castleLog.pop()
             # Sets the current castle rights back to its previous state
             rights = self.castleLog[-1]
             self.castleRight = Castle(rights.wks, rights.bks, rights.wqs, rights.bqs)
+            # Sets the zobrist key back to the key before the move
+            self.zobristLog.pop()
+            self.zobristKey = self.zobristLog[-1]
+            # Sets the material and piece square scores back to the scores before the move
+            self.evaluationLog.pop()
+            self.materialScore['w'], self.materialScore['b'], self.pieceSquareScore['w'], self.pieceSquareScore['b'] = self.evaluationLog[-1]
+            # Puts back the captured piece and the promoted pawn in the piece counts
+            self.updatePieceCounts(move, -1)
             # Checks to see if a castle move was undone
             if move.isCastle:
                 # Checks to see if the move was to the king or queen's side
@@ -168,32 +246,297 @@ class Game:
                     self.castleRight.bqs = False
                 elif move.startColumn == 7:
                     self.castleRight.bks = False
+        # Checks to see if a rook was captured on its starting square
+        if move.pieceCaptured == "wR" and move.endRow == 7:
+            if move.endColumn == 0:
+                self.castleRight.wqs = False
+            elif move.endColumn == 7:
+                self.castleRight.wks = False
+        elif move.pieceCaptured == "bR" and move.endRow == 0:
+            if move.endColumn == 0:
+                self.castleRight.bqs = False
+            elif move.endColumn == 7:
+                self.castleRight.bks = False
+
+    # Sets up a position from a board list, whose turn it is, the castle rights, the en passant location, and the move counters. Clears the move history
+    def setPosition(self, board, whitesMove, castleRight, enPassantPossible=(), halfmoveClock=0, fullmoveNumber=1):
+        # Copies the board so the list given is not changed by moves
+        self.board = [list(row) for row in board]
+        self.whitesMove = whitesMove
+        self.moveHistory = []
+        # Finds both kings on the new board
+        for row in range(8):
+            for column in range(8):
+                if self.board[row][column] == "wK":
+                    self.whiteKingLocation = (row, column)
+                elif self.board[row][column] == "bK":
+                    self.blackKingLocation = (row, column)
+        self.checkmate = False
+        self.stalemate = False
+        self.enPassantPossible = enPassantPossible
+        self.enPassantPossibleLog = []
+        self.halfmoveClock = halfmoveClock
+        self.fullmoveNumber = fullmoveNumber
+        self.moveCounterLog = []
+        self.castleRight = Castle(castleRight.wks, castleRight.bks, castleRight.wqs, castleRight.bqs)
+        self.castleLog = [Castle(self.castleRight.wks, self.castleRight.bks, self.castleRight.wqs, self.castleRight.bqs)]
+        self.zobristKey = self.computeZobristKey()
+        self.zobristLog = [self.zobristKey]
+        self.setEvaluationScores()
+        self.evaluationLog = [(self.materialScore['w'], self.materialScore['b'], self.pieceSquareScore['w'], self.pieceSquareScore['b'])]
+        self.repetitionCounts = {self.getRepetitionKey(): 1}
+        self.pieceCounts, self.bishopSquareCounts = self.computePieceCounts()
+
+    # Sets up the position described by a FEN string. The move counters can be left off and default to 0 and 1
+    def loadFEN(self, fen):
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError("FEN must have 4 or 6 fields: " + fen)
+        # Builds the board from each rank where numbers are empty squares
+        board = []
+        for rank in fields[0].split("/"):
+            row = []
+            for character in rank:
+                if character in "12345678":
+                    row.extend(["--"] * int(character))
+                elif character.upper() in "PRNBQK":
+                    row.append(('w' if character.isupper() else 'b') + character.upper())
+                else:
+                    raise ValueError("Invalid piece '" + character + "' in FEN: " + fen)
+            if len(row) != 8:
+                raise ValueError("Rank '" + rank + "' does not have 8 squares in FEN: " + fen)
+            board.append(row)
+        if len(board) != 8:
+            raise ValueError("FEN board does not have 8 ranks: " + fen)
+        # Each side needs exactly one king and pawns can not be on the first or last rank
+        for color, name in (('w', "white"), ('b', "black")):
+            if sum(row.count(color + 'K') for row in board) != 1:
+                raise ValueError("FEN must have exactly one " + name + " king: " + fen)
+        if "wP" in board[0] + board[7] or "bP" in board[0] + board[7]:
+            raise ValueError("Pawns can not be on the first or last rank in FEN: " + fen)
+        if fields[1] not in ("w", "b"):
+            raise ValueError("Side to move must be w or b in FEN: " + fen)
+        if fields[2] != "-" and (not fields[2] or any(character not in "KQkq" for character in fields[2])):
+            raise ValueError("Invalid castle rights in FEN: " + fen)
+        # Each castle right needs the king and the rook on their starting squares
+        for right, (row, rookColumn, color) in {'K': (7, 7, 'w'), 'Q': (7, 0, 'w'), 'k': (0, 7, 'b'), 'q': (0, 0, 'b')}.items():
+            if right in fields[2] and (board[row][4] != color + 'K' or board[row][rookColumn] != color + 'R'):
+                raise ValueError("Castle right '" + right + "' without the king and rook on their starting squares in FEN: " + fen)
+        # Finds the en passant location from the square in rank file notation
+        if fields[3] == "-":
+            enPassantPossible = ()
+        elif len(fields[3]) == 2 and fields[3][0] in COLUMNSTOFILES and fields[3][1] in ROWSTORANKS:
+            enPassantPossible = (ROWSTORANKS.index(fields[3][1]), COLUMNSTOFILES.index(fields[3][0]))
+            # The square is behind a pawn that just moved two squares so it is on rank 6 with white to move and rank 3 with black to move
+            row, pawnRow, pawn = (2, 3, "bP") if fields[1] == "w" else (5, 4, "wP")
+            column = enPassantPossible[1]
+            if enPassantPossible[0] != row or board[row][column] != "--" or board[pawnRow][column] != pawn:
+                raise ValueError("En passant square does not follow a two square pawn move in FEN: " + fen)
+        else:
+            raise ValueError("Invalid en passant square in FEN: " + fen)
+        try:
+            halfmoveClock, fullmoveNumber = (int(fields[4]), int(fields[5])) if len(fields) == 6 else (0, 1)
+        except ValueError:
+            raise ValueError("Move counters must be numbers in FEN: " + fen)
+        if halfmoveClock < 0 or fullmoveNumber < 1:
+            raise ValueError("Halfmove clock can not be negative and fullmove number must be at least 1 in FEN: " + fen)
+        self.setPosition(board, fields[1] == "w", Castle('K' in fields[2], 'k' in fields[2], 'Q' in fields[2], 'q' in fields[2]), enPassantPossible, halfmoveClock, fullmoveNumber)
+        # The player who just moved can not have left their king in check. Whose turn it is is swapped so inCheck looks at that king
+        self.whitesMove = not self.whitesMove
+        opponentInCheck = self.inCheck()
+        self.whitesMove = not self.whitesMove
+        if opponentInCheck:
+            raise ValueError("King of the side not to move is in check in FEN: " + fen)
+        return self
+
+    # Returns the FEN string of the current position
+    def getFEN(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                # Counts empty squares in a row and writes them as a single number
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1] if piece[0] == 'w' else piece[1].lower()
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castle = ("K" if self.castleRight.wks else "") + ("Q" if self.castleRight.wqs else "") + ("k" if self.castleRight.bks else "") + ("q" if self.castleRight.bqs else "")
+        enPassant = COLUMNSTOFILES[self.enPassantPossible[1]] + ROWSTORANKS[self.enPassantPossible[0]] if self.enPassantPossible else "-"
+        return " ".join(("/".join(ranks), "w" if self.whitesMove else "b", castle or "-", enPassant, str(self.halfmoveClock), str(self.fullmoveNumber)))
+
+    # Creates a game set up at the position described by a FEN string. Works for subclasses so BitboardGame.fromFEN returns a BitboardGame
+    @classmethod
+    def fromFEN(cls, fen):
+        return cls().loadFEN(fen)
+
+    # Updates the zobrist key after makeMove has changed the board, castle rights, and en passant location
+    def updateZobristKey(self, move):
+        key = self.zobristKey
+        # Removes the piece from its starting square and adds the piece it ends as to the ending square
+        key ^= ZOBRISTPIECES[move.pieceMoved][move.startRow][move.startColumn]
+        key ^= ZOBRISTPIECES[self.board[move.endRow][move.endColumn]][move.endRow][move.endColumn]
+        # Removes the captured piece which is beside the starting square for en passant
+        if move.pieceCaptured != "--":
+            key ^= ZOBRISTPIECES[move.pieceCaptured][move.startRow if move.isEnPassant else move.endRow][move.endColumn]
+        # Moves the rook for castle moves
+        if move.isCastle:
+            rook = ZOBRISTPIECES[move.pieceMoved[0] + 'R'][move.endRow]
+            if move.endColumn - move.startColumn == 2:
+                key ^= rook[move.endColumn+1] ^ rook[move.endColumn-1]
+            else:
+                key ^= rook[move.endColumn-2] ^ rook[move.endColumn+1]
+        # Swaps the previous castle rights for the new ones
+        key ^= ZOBRISTCASTLE[self.castleLog[-2].getIndex()] ^ ZOBRISTCASTLE[self.castleRight.getIndex()]
+        # Swaps the previous en passant column for the new one
+        if self.enPassantPossibleLog[-1] != ():
+            key ^= ZOBRISTENPASSANT[self.enPassantPossibleLog[-1][1]]
+        if self.enPassantPossible != ():
+            key ^= ZOBRISTENPASSANT[self.enPassantPossible[1]]
+        self.zobristKey = key
+        self.zobristLog.append(key)
+
+    # Calculates the zobrist key from the whole board. Used when a position is set up and to check the updated key
+    def computeZobristKey(self):
+        key = 0
+        for row in range(8):
+            for column in range(8):
+                if self.board[row][column] != "--":
+                    key ^= ZOBRISTPIECES[self.board[row][column]][row][column]
+        key ^= ZOBRISTCASTLE[self.castleRight.getIndex()]
+        if self.enPassantPossible != ():
+            key ^= ZOBRISTENPASSANT[self.enPassantPossible[1]]
+        return key
+
+    # Returns a 64 bit key identifying the position including whose turn it is
+    def getPositionKey(self):
+        return self.zobristKey ^ ZOBRISTBLACKTOMOVE if not self.whitesMove else self.zobristKey
+
+    # Returns the position key used for draws by repetition. The en passant column only counts when a pawn of the player to move is beside the pawn that moved two squares, since otherwise the positions are the same
+    def getRepetitionKey(self):
+        key = self.getPositionKey()
+        if self.enPassantPossible != ():
+            row, column = self.enPassantPossible
+            # The pawn that moved two squares is on the row past the en passant square from the side of the player to move
+            pawnRow, pawn = (row + 1, "wP") if self.whitesMove else (row - 1, "bP")
+            if not any(0 <= captureColumn < 8 and self.board[pawnRow][captureColumn] == pawn for captureColumn in (column - 1, column + 1)):
+                key ^= ZOBRISTENPASSANT[column]
+        return key
+
+    # Updates the material and piece square scores after makeMove has changed the board
+    def updateEvaluationScores(self, move):
+        color = move.pieceMoved[0]
+        # Black uses the piece square tables with the rows reversed
+        startRow, endRow = (move.startRow, move.endRow) if color == 'w' else (7 - move.startRow, 7 - move.endRow)
+        pieceEnded = self.board[move.endRow][move.endColumn]
+        # Moves the piece between squares and adds the value gained by a pawn promotion
+        self.pieceSquareScore[color] += PIECESQUARETABLES[pieceEnded[1]][endRow][move.endColumn] - PIECESQUARETABLES[move.pieceMoved[1]][startRow][move.startColumn]
+        if move.isPawnPromotion:
+            self.materialScore[color] += PIECEVALUES[pieceEnded[1]] - PIECEVALUES['P']
+        # Removes the captured piece which is beside the starting square for en passant
+        if move.pieceCaptured != "--":
+            enemyColor = move.pieceCaptured[0]
+            captureRow = move.startRow if move.isEnPassant else move.endRow
+            self.materialScore[enemyColor] -= PIECEVALUES[move.pieceCaptured[1]]
+            self.pieceSquareScore[enemyColor] -= PIECESQUARETABLES[move.pieceCaptured[1]][captureRow if enemyColor == 'w' else 7 - captureRow][move.endColumn]
+        # Moves the rook for castle moves
+        if move.isCastle:
+            rookTable = PIECESQUARETABLES['R'][endRow]
+            if move.endColumn - move.startColumn == 2:
+                self.pieceSquareScore[color] += rookTable[move.endColumn-1] - rookTable[move.endColumn+1]
+            else:
+                self.pieceSquareScore[color] += rookTable[move.endColumn+1] - rookTable[move.endColumn-2]
+        self.evaluationLog.append((self.materialScore['w'], self.materialScore['b'], self.pieceSquareScore['w'], self.pieceSquareScore['b']))
+
+    # Calculates the material and piece square scores from the whole board. Used when a position is set up and to check the updated scores
+    def computeEvaluationScores(self):
+        materialScore = {'w': 0, 'b': 0}
+        pieceSquareScore = {'w': 0, 'b': 0}
+        for row in range(8):
+            for column in range(8):
+                piece = self.board[row][column]
+                if piece != "--":
+                    materialScore[piece[0]] += PIECEVALUES[piece[1]]
+                    pieceSquareScore[piece[0]] += PIECESQUARETABLES[piece[1]][row if piece[0] == 'w' else 7 - row][column]
+        return materialScore, pieceSquareScore
+
+    # Sets the material and piece square scores from the whole board
+    def setEvaluationScores(self):
+        self.materialScore, self.pieceSquareScore = self.computeEvaluationScores()
+
+    # Returns the score of the position in centipawns for the player whose turn it is
+    def getEvaluation(self):
+        score = self.materialScore['w'] + self.pieceSquareScore['w'] - self.materialScore['b'] - self.pieceSquareScore['b']
+        return score if self.whitesMove else -score
 
+    # Adds a promoted piece and removes a captured piece and promoted pawn from the piece counts. The direction is 1 after making the move and -1 when undoing it
+    def updatePieceCounts(self, move, direction):
+        if move.pieceCaptured != "--":
+            self.pieceCounts[move.pieceCaptured] -= direction
+            # Pieces captured en passant are pawns so the ending square is the square of any captured bishop
+            if move.pieceCaptured[1] == 'B':
+                self.bishopSquareCounts[(move.endRow + move.endColumn) % 2] -= direction
+        if move.isPawnPromotion:
+            self.pieceCounts[move.pieceMoved] -= direction
+            self.pieceCounts[move.pieceMoved[0] + move.promotionPiece] += direction
+            if move.promotionPiece == 'B':
+                self.bishopSquareCounts[(move.endRow + move.endColumn) % 2] += direction
+
+    # Counts the pieces on the whole board and the bishops on light and dark squares. Used when a position is set up and to check the updated counts
+    def computePieceCounts(self):
+        pieceCounts = {color + piece: 0 for color in "wb" for piece in "PRNBQK"}
+        bishopSquareCounts = [0, 0]
+        for row in range(8):
+            for column in range(8):
+                piece = self.board[row][column]
+                if piece != "--":
+                    pieceCounts[piece] += 1
+                    if piece[1] == 'B':
+                        bishopSquareCounts[(row + column) % 2] += 1
+        return pieceCounts, bishopSquareCounts
+
+    # Returns the reason the position is a draw by repetition, the fifty move rule, or insufficient material, or None if it is not. Checkmate and stalemate are found by getValidMoves
+    def getDrawReason(self):
+        if self.repetitionCounts.get(self.getRepetitionKey(), 0) >= REPETITIONLIMIT:
+            return "repetition"
+        if self.halfmoveClock >= FIFTYMOVELIMIT:
+            return "fifty move rule"
+        if self.isInsufficientMaterial():
+            return "insufficient material"
+        return None
+
+    # Determines if neither player has the pieces to checkmate. Only kings with a single knight or bishop, or with bishops all on the same square color, remain
+    def isInsufficientMaterial(self):
+        counts = self.pieceCounts
+        if counts['wP'] or counts['bP'] or counts['wR'] or counts['bR'] or counts['wQ'] or counts['bQ']:
+            return False
+        knights = counts['wN'] + counts['bN']
+        return knights + counts['wB'] + counts['bB'] <= 1 or (knights == 0 and 0 in self.bishopSquareCounts)
 
-    # Generates all legal moves
+
+    # Generates all legal moves or returns them from moveCache if the position was seen recently
     def getValidMoves(self):
-        # Generates all possible moves
-        moves = self.getAllPossibleMoves()
-        # Checks to see whose turn it is
-        if self.whitesMove:
-            # Adds castle moves to moves list from the getCastleMoves fx for the white king. The castle moves are already checked for validity
-            self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
+        if self.moveCacheSize > 0:
+            key = self.getPositionKey()
+            if key in self.moveCache:
+                self.moveCacheHits += 1
+                # Marks the position as the most recently used
+                self.moveCache.move_to_end(key)
+                moves, self.checkmate, self.stalemate = self.moveCache[key]
+                # Returns a new list so changes to it do not change the cache
+                return list(moves)
+            self.moveCacheMisses += 1
+        # Filters the possible moves using the attack map or the slower make and undo reference
+        if self.useAttackMap:
+            moves = self.getAttackMapMoves()
         else:
-            # Adds castle moves to moves list from the getCastleMoves fx for the black king. The castle moves are already checked for validity
-            self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
-        # Iterates backwords through the list to remove any illegal moves without skipping
-        for i in range(len(moves)-1, -1, -1):
-            # Makes the the moves and switches the turn to the opposing player in the process
-            self.makeMove(moves[i])
-            # Switches turns back to check if the player who made the move made an illegal move
-            self.whitesMove = not self.whitesMove
-            if self.inCheck():
-                # Removes the illegal move from the list of valid moves because the king is in check
-                moves.remove(moves[i])
-            # Switches turn back
-            self.whitesMove = not self.whitesMove
-            # Undoes the illegal move
-            self.undoMove()
+            moves = self.getMakeUndoMoves()
         # Determines if any moves are able to be made
         if len(moves) == 0:
             # Determins if the king is in check
@@ -207,9 +550,203 @@ class Game:
             # Allows for moves to be undone after checkmate and stalemate are true
             self.checkmate = False
             self.stalemate = False
+        # Stores the moves and removes the least recently used position once the cache is full
+        if self.moveCacheSize > 0:
+            self.moveCache[key] = (tuple(moves), self.checkmate, self.stalemate)
+            while len(self.moveCache) > self.moveCacheSize:
+                self.moveCache.popitem(last=False)
         # Returns list of every legal move as an object of the Move class
         return moves
 
+    # Returns the legal moves of the current position as a MoveIndex, building it again only once the position has changed
+    def getMoveIndex(self):
+        key = self.getPositionKey()
+        if self.moveIndex is None or self.moveIndexKey != key:
+            self.moveIndex = MoveIndex(self.getValidMoves())
+            self.moveIndexKey = key
+        return self.moveIndex
+
+    # Returns an independent copy of the game that can be searched without changing this one. The copy starts with an empty move cache
+    def copy(self):
+        return copy.deepcopy(self, {id(self.moveCache): OrderedDict()})
+
+    # Empties moveCache and resets the hit and miss counts
+    def clearMoveCache(self):
+        self.moveCache.clear()
+        self.moveCacheHits = 0
+        self.moveCacheMisses = 0
+
+    # Generates all legal moves by making every possible move and checking if the king is left in check. Kept as a reference to cross check getAttackMapMoves
+    def getMakeUndoMoves(self):
+        # Generates all possible moves
+        moves = self.getAllPossibleMoves()
+        # Checks to see whose turn it is
+        if self.whitesMove:
+            # Adds castle moves to moves list from the getCastleMoves fx for the white king. The castle moves are already checked for validity
+            self.getCastleMoves(self.whiteKingLocation[0], self.whiteKingLocation[1], moves)
+        else:
+            # Adds castle moves to moves list from the getCastleMoves fx for the black king. The castle moves are already checked for validity
+            self.getCastleMoves(self.blackKingLocation[0], self.blackKingLocation[1], moves)
+        # Iterates backwords through the list to remove any illegal moves without skipping
+        for i in range(len(moves)-1, -1, -1):
+            # Removes the illegal move from the list of valid moves because the king is in check
+            if self.leavesKingInCheck(moves[i]):
+                moves.remove(moves[i])
+        # Returns list of every legal move as an object of the Move class
+        return moves
+
+    # Generates all legal moves from the pins, checks, and squares attacked by the enemy which are found once per position
+    def getAttackMapMoves(self):
+        moves = []
+        # Location of the king whose turn it is
+        kingRow, kingColumn = self.whiteKingLocation if self.whitesMove else self.blackKingLocation
+        # Finds the pieces pinned to the king and the pieces giving check
+        pins, checks = self.checkForPinsAndChecks(kingRow, kingColumn)
+        # Finds every square the enemy attacks with the king removed so it cannot step back along a checking line
+        attackedSquares = self.getAttackedSquares()
+        # Maps each pinned piece's location to the direction it is pinned from
+        pinDirections = {(pin[0], pin[1]): (pin[2], pin[3]) for pin in pins}
+        # Squares a piece can move to in order to capture or block a single checking piece
+        blockSquares = set()
+        if len(checks) == 1:
+            checkRow, checkColumn, directionRow, directionColumn = checks[0]
+            # A knight or pawn check can only be captured
+            if (directionRow, directionColumn) == (0, 0):
+                blockSquares.add((checkRow, checkColumn))
+            else:
+                # Adds every square from the king up to and including the checking piece
+                for i in range(1, 8):
+                    blockSquares.add((kingRow + directionRow * i, kingColumn + directionColumn * i))
+                    if (kingRow + directionRow * i, kingColumn + directionColumn * i) == (checkRow, checkColumn):
+                        break
+        # Iterates through every possible move and keeps only the legal ones
+        for move in self.getAllPossibleMoves():
+            # The king can only move to squares that are not attacked
+            if move.pieceMoved[1] == 'K':
+                if (move.endRow, move.endColumn) not in attackedSquares:
+                    moves.append(move)
+                continue
+            # Only the king can move out of a double check
+            if len(checks) > 1:
+                continue
+            # A pinned piece can only move along the line between the king and the pinning piece
+            if (move.startRow, move.startColumn) in pinDirections:
+                directionRow, directionColumn = pinDirections[(move.startRow, move.startColumn)]
+                if (move.endRow - kingRow) * directionColumn != (move.endColumn - kingColumn) * directionRow:
+                    continue
+            # A single check must be captured or blocked. En passant can capture a checking pawn without landing on its square
+            if len(checks) == 1 and (move.endRow, move.endColumn) not in blockSquares:
+                if not (move.isEnPassant and (move.startRow, move.endColumn) in blockSquares):
+                    continue
+            # En passant removes two pawns from the board at once so it is checked by making the move
+            if move.isEnPassant and self.leavesKingInCheck(move):
+                continue
+            moves.append(move)
+        # Castle moves are only possible when not in check and are checked against the attacked squares
+        if len(checks) == 0:
+            self.getCastleMoves(kingRow, kingColumn, moves, attackedSquares)
+        # Returns list of every legal move as an object of the Move class
+        return moves
+
+    # Determines if a move leaves the king of the player making it in check by making and undoing the move
+    def leavesKingInCheck(self, move):
+        # Makes the the moves and switches the turn to the opposing player in the process
+        self.makeMove(move)
+        # Switches turns back to check if the player who made the move made an illegal move
+        self.whitesMove = not self.whitesMove
+        check = self.inCheck()
+        # Switches turn back
+        self.whitesMove = not self.whitesMove
+        # Undoes the move
+        self.undoMove()
+        return check
+
+    # Finds the pieces pinned to the king and the enemy pieces giving check by looking outwards from the king
+    def checkForPinsAndChecks(self, kingRow, kingColumn):
+        # Pins and checks are stored as the location of the piece and the direction from the king
+        pins = []
+        checks = []
+        allyColor = 'w' if self.whitesMove else 'b'
+        enemyColor = 'b' if self.whitesMove else 'w'
+        # Looks along every line a rook, bishop, or queen could attack the king from
+        for d in ROOKDIRECTIONS + BISHOPDIRECTIONS:
+            # Keeps track of the first allied piece found in the direction
+            possiblePin = ()
+            for i in range(1, 8):
+                endRow = kingRow + d[0] * i
+                endColumn = kingColumn + d[1] * i
+                # Stops looking once the line goes off the board
+                if not (0 <= endRow < 8 and 0 <= endColumn < 8):
+                    break
+                endPiece = self.board[endRow][endColumn]
+                # The first allied piece could be pinned and a second allied piece blocks the line
+                if endPiece[0] == allyColor:
+                    if possiblePin == ():
+                        possiblePin = (endRow, endColumn, d[0], d[1])
+                    else:
+                        break
+                elif endPiece[0] == enemyColor:
+                    # Checks if the enemy piece is able to attack along this line
+                    if endPiece[1] == 'Q' or (endPiece[1] == 'R' and d in ROOKDIRECTIONS) or (endPiece[1] == 'B' and d in BISHOPDIRECTIONS):
+                        # Nothing is in between so the king is in check, otherwise the allied piece is pinned
+                        if possiblePin == ():
+                            checks.append((endRow, endColumn, d[0], d[1]))
+                        else:
+                            pins.append(possiblePin)
+                    break
+        # Checks for knights attacking the king
+        for d in KNIGHTDIRECTIONS:
+            endRow = kingRow + d[0]
+            endColumn = kingColumn + d[1]
+            if 0 <= endRow < 8 and 0 <= endColumn < 8 and self.board[endRow][endColumn] == enemyColor + 'N':
+                checks.append((endRow, endColumn, 0, 0))
+        # Checks for pawns attacking the king diagonally from the direction they move
+        pawnRow = kingRow - 1 if self.whitesMove else kingRow + 1
+        if 0 <= pawnRow < 8:
+            for pawnColumn in (kingColumn - 1, kingColumn + 1):
+                if 0 <= pawnColumn < 8 and self.board[pawnRow][pawnColumn] == enemyColor + 'P':
+                    checks.append((pawnRow, pawnColumn, 0, 0))
+        return pins, checks
+
+    # Generates a set of every square the enemy attacks. The king whose turn it is does not block the enemy's lines of attack
+    def getAttackedSquares(self):
+        attackedSquares = set()
+        enemyColor = 'b' if self.whitesMove else 'w'
+        allyKing = 'wK' if self.whitesMove else 'bK'
+        # Iterates through all squares on the board for the enemy's pieces
+        for row in range(8):
+            for column in range(8):
+                piece = self.board[row][column]
+                if piece[0] != enemyColor:
+                    continue
+                # Pawns attack the two squares diagonally in front of them
+                if piece[1] == 'P':
+                    endRow = row + 1 if enemyColor == 'b' else row - 1
+                    for endColumn in (column - 1, column + 1):
+                        if 0 <= endRow < 8 and 0 <= endColumn < 8:
+                            attackedSquares.add((endRow, endColumn))
+                # Knights and kings attack a fixed set of squares around them
+                elif piece[1] == 'N' or piece[1] == 'K':
+                    for d in (KNIGHTDIRECTIONS if piece[1] == 'N' else KINGDIRECTIONS):
+                        endRow = row + d[0]
+                        endColumn = column + d[1]
+                        if 0 <= endRow < 8 and 0 <= endColumn < 8:
+                            attackedSquares.add((endRow, endColumn))
+                # Rooks, bishops, and queens attack along lines until a piece is reached
+                else:
+                    directions = ROOKDIRECTIONS if piece[1] == 'R' else BISHOPDIRECTIONS if piece[1] == 'B' else ROOKDIRECTIONS + BISHOPDIRECTIONS
+                    for d in directions:
+                        for i in range(1, 8):
+                            endRow = row + d[0] * i
+                            endColumn = column + d[1] * i
+                            if not (0 <= endRow < 8 and 0 <= endColumn < 8):
+                                break
+                            attackedSquares.add((endRow, endColumn))
+                            # Any piece other than the allied king blocks the line
+                            if self.board[endRow][endColumn] != "--" and self.board[endRow][endColumn] != allyKing:
+                                break
+        return attackedSquares
+
     # Determines if the king is in check
     def inCheck(self):
         # Checks if the white king's square is in check using the squareUnderAttack fx
@@ -219,20 +756,59 @@ class Game:
         else:
             return self.squareUnderAttack(self.blackKingLocation[0], self.blackKingLocation[1])
         
-    # Determines if the enemy can attack a certain location
+    # Determines if the enemy can attack a certain location by looking outwards from it for a piece able to reach it
     def squareUnderAttack(self, row, column):
-        # Switches to enemy to see their possible moves
-        self.whitesMove = not self.whitesMove
-        # Generates opponents moves
-        oppMoves = self.getAllPossibleMoves()
-        # Switches turn back
-        self.whitesMove = not self.whitesMove
-        # See if any of the opponents moves attack the particular location
-        for move in oppMoves:
-            # Checks to see if any of the moves end on the particular row and column
-            if move.endRow == row and move.endColumn == column:
-                # The particular row and column are under attack
+        # Names of the enemy pieces that could be attacking
+        if self.whitesMove:
+            pawn, knight, bishop, rook, queen, king = "bP", "bN", "bB", "bR", "bQ", "bK"
+            # Black pawns attack downwards so an attacking pawn is one row above
+            pawnRow = row - 1
+        else:
+            pawn, knight, bishop, rook, queen, king = "wP", "wN", "wB", "wR", "wQ", "wK"
+            # White pawns attack upwards so an attacking pawn is one row below
+            pawnRow = row + 1
+        # Checks the two squares a pawn could attack from
+        if 0 <= pawnRow < 8:
+            if column - 1 >= 0 and self.board[pawnRow][column-1] == pawn:
+                return True
+            if column + 1 <= 7 and self.board[pawnRow][column+1] == pawn:
+                return True
+        # Checks every square a knight could jump from
+        for d in KNIGHTDIRECTIONS:
+            endRow = row + d[0]
+            endColumn = column + d[1]
+            if 0 <= endRow < 8 and 0 <= endColumn < 8 and self.board[endRow][endColumn] == knight:
+                return True
+        # Checks every square next to the location for the enemy king
+        for d in KINGDIRECTIONS:
+            endRow = row + d[0]
+            endColumn = column + d[1]
+            if 0 <= endRow < 8 and 0 <= endColumn < 8 and self.board[endRow][endColumn] == king:
                 return True
+        # Looks along the vertical and horizontal lines for the first piece which could be a rook or queen
+        for d in ROOKDIRECTIONS:
+            for i in range(1, 8):
+                endRow = row + d[0] * i
+                endColumn = column + d[1] * i
+                if not (0 <= endRow < 8 and 0 <= endColumn < 8):
+                    break
+                endPiece = self.board[endRow][endColumn]
+                if endPiece != "--":
+                    if endPiece == rook or endPiece == queen:
+                        return True
+                    break
+        # Looks along the diagonal lines for the first piece which could be a bishop or queen
+        for d in BISHOPDIRECTIONS:
+            for i in range(1, 8):
+                endRow = row + d[0] * i
+                endColumn = column + d[1] * i
+                if not (0 <= endRow < 8 and 0 <= endColumn < 8):
+                    break
+                endPiece = self.board[endRow][endColumn]
+                if endPiece != "--":
+                    if endPiece == bishop or endPiece == queen:
+                        return True
+                    break
         # The location is not under attack
         return False
 
@@ -277,7 +853,7 @@ class Game:
             if row+moveAmount == endingRow:
                 pawnPromotion = True
             # Adds the possible move to moves list
-            moves.append(Move((row, column), (row+moveAmount, column), self.board, isPawnPromotion=pawnPromotion))
+            self.addPawnMoves((row, column), (row+moveAmount, column), moves, pawnPromotion)
             # Checks to see if the pawn is at the starting row and can move two squares forward
             if row == startingRow and self.board[row+moveAmount*2][column] == "--":
                 # Adds the possible move to moves list
@@ -289,7 +865,7 @@ class Game:
                 # Checks if the pawn is on the ending row where pawn promotion is possible
                 if row+moveAmount == endingRow:
                     pawnPromotion = True
-                moves.append(Move((row, column), (row+moveAmount, column-1), self.board, isPawnPromotion=pawnPromotion))
+                self.addPawnMoves((row, column), (row+moveAmount, column-1), moves, pawnPromotion)
             # Checks if an en passant move is possible to be made
             elif (row+moveAmount, column-1) == self.enPassantPossible:
                 moves.append(Move((row, column), (row+moveAmount, column-1), self.board, isEnPassant=True))
@@ -300,11 +876,19 @@ class Game:
                 # Checks if the pawn is on the ending row where pawn promotion is possible
                 if row+moveAmount == endingRow:
                     pawnPromotion = True
-                moves.append(Move((row, column), (row+moveAmount, column+1), self.board, isPawnPromotion=pawnPromotion))
+                self.addPawnMoves((row, column), (row+moveAmount, column+1), moves, pawnPromotion)
             # Checks if an en passant move is possible to be made
             elif (row+moveAmount, column+1) == self.enPassantPossible:
                 moves.append(Move((row, column), (row+moveAmount, column+1), self.board, isEnPassant=True))
 
+    # Adds a pawn move to the moves list with a separate move for every piece the pawn can be promoted to
+    def addPawnMoves(self, startSquare, endSquare, moves, pawnPromotion):
+        if pawnPromotion:
+            for piece in PROMOTIONPIECES:
+                moves.append(Move(startSquare, endSquare, self.board, isPawnPromotion=True, promotionPiece=piece))
+        else:
+            moves.append(Move(startSquare, endSquare, self.board))
+
     # Get all of the possible moves for the ROOK at the specific location
     def getRookMoves(self, row, column, moves):
         # Possible directions a rook can move (up, left, down, right)
@@ -419,37 +1003,43 @@ class Game:
                 if endPiece[0] == enemyColor or endPiece == "--":
                     moves.append(Move((row, column), (endRow, endColumn), self.board))
 
-    # Generates possible castle moves for the king and adds them to moves list
-    def getCastleMoves(self, row, column, moves):
+    # Generates possible castle moves for the king and adds them to moves list. The attack map is used for the squares when it is given
+    def getCastleMoves(self, row, column, moves, attackedSquares=None):
         # Checks to see if the king is in check
-        if self.squareUnderAttack(row, column):
+        if self.isSquareAttacked(row, column, attackedSquares):
             # King cannot castle in check and no moves are returned
             return
         # Checks to see if the king can castle to its side
         if (self.whitesMove and self.castleRight.wks) or (not self.whitesMove and self.castleRight.bks):
-            self.getKingSideCastleMoves(row, column, moves)
+            self.getKingSideCastleMoves(row, column, moves, attackedSquares)
         # Checks to see if the king can castle to the queen's side
         if (self.whitesMove and self.castleRight.wqs) or (not self.whitesMove and self.castleRight.bqs):
-            self.getQueenSideCastleMoves(row, column, moves)
+            self.getQueenSideCastleMoves(row, column, moves, attackedSquares)
     
     # Generates castle moves on the the king's side and adds to the list
-    def getKingSideCastleMoves(self, row, column, moves):
+    def getKingSideCastleMoves(self, row, column, moves, attackedSquares=None):
         # Checks to see if the two squares between the king and the rook are empty
         if self.board[row][column+1] == "--" and self.board[row][column+2] == "--":
             # Makes sure none of the empty squares are under attack
-            if not self.squareUnderAttack(row, column+1) and not self.squareUnderAttack(row, column+2):
+            if not self.isSquareAttacked(row, column+1, attackedSquares) and not self.isSquareAttacked(row, column+2, attackedSquares):
                 # The castling move is added to the moves list
                 moves.append(Move((row,column), (row, column+2), self.board, isCastle=True))
 
     # Generates castle moves on the queen's side and adds to the list
-    def getQueenSideCastleMoves(self, row, column, moves):
+    def getQueenSideCastleMoves(self, row, column, moves, attackedSquares=None):
         # Checks to see if the three squares between the king and the rook are empty
         if self.board[row][column-1] == "--" and self.board[row][column-2] == "--" and self.board[row][column-3] == "--":
             # Makes sure none of the empty squares are under attack
-            if not self.squareUnderAttack(row, column-1) and not self.squareUnderAttack(row, column-2):
+            if not self.isSquareAttacked(row, column-1, attackedSquares) and not self.isSquareAttacked(row, column-2, attackedSquares):
                 # The castling move is added to the moves list
                 moves.append(Move((row,column), (row, column-2), self.board, isCastle=True))
 
+    # Determines if a square is attacked using the attack map if one was made or by searching the enemy's moves
+    def isSquareAttacked(self, row, column, attackedSquares=None):
+        if attackedSquares is not None:
+            return (row, column) in attackedSquares
+        return self.squareUnderAttack(row, column)
+
 
 # Stores whether a castle is able to be made at a certain position
 class Castle:
@@ -464,10 +1054,47 @@ class Castle:
         # Black Queen Side
         self.bqs = bqs
 
+    # Returns a number from 0 - 15 with a bit set for each castle right
+    def getIndex(self):
+        return self.wks | self.wqs << 1 | self.bks << 2 | self.bqs << 3
+
+
+# Groups legal moves by the square they start on and by their start and end squares so a move can be found without searching every move
+class MoveIndex:
+    def __init__(self, moves):
+        # List of every legal move as an object of the Move class
+        self.moves = moves
+        # Start square as the key and a list of the moves from it as the value
+        self.movesFrom = {}
+        # Start and end square as the key and a list of the moves between them as the value. A promotion has a move for each piece
+        self.movesBetween = {}
+        for move in moves:
+            startSquare = (move.startRow, move.startColumn)
+            self.movesFrom.setdefault(startSquare, []).append(move)
+            self.movesBetween.setdefault((startSquare, (move.endRow, move.endColumn)), []).append(move)
+
+    # Returns the moves starting on the square
+    def getMovesFrom(self, square):
+        return self.movesFrom.get(square, [])
+
+    # Returns the moves from the start square to the end square
+    def getMovesBetween(self, startSquare, endSquare):
+        return self.movesBetween.get((startSquare, endSquare), [])
+
+    # Returns the move from the start square to the end square promoting to the piece given, or None if the move is not legal
+    def getMove(self, startSquare, endSquare, promotionPiece='Q'):
+        for move in self.getMovesBetween(startSquare, endSquare):
+            if not move.isPawnPromotion or move.promotionPiece == promotionPiece:
+                return move
+        return None
+
 
 # Stores information about the move being made
 class Move:
-    def __init__(self, startSquare, endSquare, board, isEnPassant=False, isPawnPromotion=False, isCastle=False):
+    # Fixed attributes so moves are stored without a dictionary, which keeps them small and quick to create when generating many moves
+    __slots__ = ("startRow", "startColumn", "endRow", "endColumn", "pieceMoved", "pieceCaptured", "moveID", "isPawnPromotion", "promotionPiece", "isEnPassant", "isCastle")
+
+    def __init__(self, startSquare, endSquare, board, isEnPassant=False, isPawnPromotion=False, isCastle=False, promotionPiece='Q'):
         # Location of where a piece starts as index for board
         self.startRow = startSquare[0]
         self.startColumn = startSquare[1]
@@ -478,11 +1105,13 @@ class Move:
         self.pieceMoved = board[self.startRow][self.startColumn]
         # What piece was at the end location or if no piece was there
         self.pieceCaptured = board[self.endRow][self.endColumn]
-        # Gives each move a unique number storing each start and end location on the board as its own digit
-        self.moveID = self.startRow * 1000 + self.startColumn * 100 + self.endRow * 10 + self.endColumn
         
         # Keeps track of if a pawn is changing to a different piece or not
         self.isPawnPromotion = isPawnPromotion
+        # Piece the pawn changes to when it is promoted
+        self.promotionPiece = promotionPiece
+        # Gives each move a unique number storing each start and end location on the board as its own digit followed by a digit for the promotion piece, 0 if the move is not a promotion
+        self.moveID = (self.startRow * 1000 + self.startColumn * 100 + self.endRow * 10 + self.endColumn) * 10 + (PROMOTIONPIECES.index(promotionPiece) + 1 if isPawnPromotion else 0)
         
         # Keeps track of if en passant move is possible or not
         self.isEnPassant = isEnPassant
@@ -503,10 +1132,10 @@ class Move:
 
     # Determines move in chess notation
     def getChessNotation(self):
-        # Returns a string of the move
-        return self.getRankFile(self.startRow, self.startColumn) + self.getRankFile(self.endRow, self.endColumn)
+        # Returns a string of the move with the promotion piece added to the end ie "e2e4", "a7a8q"
+        return self.getRankFile(self.startRow, self.startColumn) + self.getRankFile(self.endRow, self.endColumn) + (self.promotionPiece.lower() if self.isPawnPromotion else "")
 
     # Converts to rank file notation from the row and column notation used in board list
     def getRankFile(self, row, column):
         # Returns a string of the conversion ie "a1", "b3", "c6"
-        return self.COLUMNSTOFILES[column] + self.ROWSTORANKS[row]
\ No newline at end of file
+        return COLUMNSTOFILES[column] + ROWSTORANKS[row]
\ No newline at end of file
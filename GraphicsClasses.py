@@ -0,0 +1,199 @@
+""" This file stores the classes that cache and schedule what the app draws so it is not rebuilt every frame """
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import pygame
+
+from Constants import *
+
+
+# Keeps fonts, rendered text, and wrapped lines so the same text is not loaded and rendered again every frame
+class TextCache:
+    def __init__(self, maxSurfaces=TEXTCACHESIZE):
+        # Font name, size, and if it is a system font as the key and the loaded font as the value
+        self.fonts = {}
+        # Text, font, and colors as the key and the rendered surface as the value with the least recently used first
+        self.surfaces = OrderedDict()
+        # Number of rendered surfaces kept before the least recently used is removed
+        self.maxSurfaces = maxSurfaces
+        # Text, font, and width as the key and the lines the text is wrapped into as the value
+        self.lines = {}
+
+    # Returns the font loading it the first time it is asked for
+    def getFont(self, fontName, textSize, sFont=True):
+        key = (fontName, textSize, sFont)
+        font = self.fonts.get(key)
+        if font is None:
+            # Looking up a system font searches every font installed so it is only done once
+            font = pygame.font.SysFont(fontName, textSize) if sFont else pygame.font.Font(fontName, textSize)
+            self.fonts[key] = font
+        return font
+
+    # Returns the text rendered in the font and colors rendering it only if it is not already stored
+    def render(self, text, fontName, textSize, sFont, textColor, backgroundColor=None):
+        key = (text, fontName, textSize, sFont, textColor, backgroundColor)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            # Marks the surface as the most recently used
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.getFont(fontName, textSize, sFont).render(text, True, textColor, backgroundColor)
+        self.surfaces[key] = surface
+        # Removes the least recently used surface once there are too many
+        if len(self.surfaces) > self.maxSurfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    # Returns the lines the text is split into so each fits in the width, breaking at the last space that fits
+    def wrapText(self, text, fontName, textSize, sFont, width):
+        key = (text, fontName, textSize, sFont, width)
+        lines = self.lines.get(key)
+        if lines is None:
+            font = self.getFont(fontName, textSize, sFont)
+            lines = []
+            while text:
+                i = 1
+                # Determines the maximum width of the line of text
+                while font.size(text[:i])[0] < width and i < len(text):
+                    i += 1
+                # Checks if the text has been wrapped
+                if i < len(text):
+                    # Adjusts the text wrapping to the last word
+                    i = text.rfind(" ", 0, i) + 1
+                lines.append(text[:i])
+                # Removes the text already added
+                text = text[i:]
+            self.lines[key] = lines
+        return lines
+
+    # Removes everything stored. Used when the resolution changes since every size changes with it
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+        self.lines.clear()
+
+
+# Keeps the filled surfaces used for highlights and menu backgrounds so they are not made again every frame
+class SurfacePool:
+    def __init__(self):
+        # Size, color, and opacity as the key and the filled surface as the value
+        self.surfaces = {}
+
+    # Returns a surface of the size filled with the color at the opacity making it the first time it is asked for
+    def getSurface(self, surfaceSize, color, opacity):
+        key = (tuple(surfaceSize), color, opacity)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            # Converts the surface to the format of the screen so it is copied without being converted every time
+            surface = pygame.Surface(surfaceSize).convert()
+            # Sets the transparency value. Opaque surfaces are left without one since blending is slower than copying
+            if opacity < 255:
+                surface.set_alpha(opacity)
+            surface.fill(color)
+            self.surfaces[key] = surface
+        return surface
+
+    # Removes every surface. Used when the resolution changes since the sizes change with it
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Stores a move being animated and the board shown under the moving piece so the animation can be drawn a frame at a time
+class Animation:
+    def __init__(self, move, board):
+        self.move = move
+        # Change in rows and columns
+        self.deltaRow = move.endRow - move.startRow
+        self.deltaColumn = move.endColumn - move.startColumn
+        distance = abs(self.deltaRow) + abs(self.deltaColumn)
+        # Seconds the animation takes. Moves of five or more squares move faster for each square
+        self.duration = distance * (7 if distance < 5 else 5) / ANIMATIONFPS
+        # Time the animation started or None if it is waiting for the animations before it
+        self.startTime = None
+        # Copies the board after the move so moves made during the animation do not change it
+        self.board = [list(row) for row in board]
+        # Shows the captured piece on the ending square until the moving piece reaches it
+        if move.isEnPassant:
+            self.board[move.endRow][move.endColumn] = "--"
+            self.board[move.startRow][move.endColumn] = move.pieceCaptured
+        else:
+            self.board[move.endRow][move.endColumn] = move.pieceCaptured
+        # Checks to see if a move is a castle move
+        if move.isCastle:
+            # Checks to see if the move was to the king or queen's side and sets the distances the rook is located from the king accordingly
+            if move.endColumn - move.startColumn == 2:
+                endRook = -1
+                startRook = 1
+            else:
+                endRook = 1
+                startRook = -2
+            # Shows the rook on its starting square while the king moves
+            self.board[move.endRow][move.endColumn + endRook] = "--"
+            self.board[move.endRow][move.endColumn + startRook] = move.pieceMoved[0] + 'R'
+
+    # Starts the animation at the given time
+    def start(self, now):
+        self.startTime = now
+
+    # Determines if the animation has finished at the given time
+    def isDone(self, now):
+        return self.startTime is not None and now - self.startTime >= self.duration
+
+    # Returns the row and column the moving piece is at the given time as decimals
+    def getPosition(self, now):
+        progress = min((now - self.startTime) / self.duration, 1.0) if self.duration > 0 else 1.0
+        return (self.move.startRow + self.deltaRow * progress, self.move.startColumn + self.deltaColumn * progress)
+
+
+# Decodes the piece images once and keeps copies scaled to the square sizes recently used
+class SpriteAtlas:
+    def __init__(self, path, maxSizes=SPRITECACHESIZE):
+        # Folder the piece images are loaded from
+        self.path = path
+        # Piece name as the key and the image at its full size as the value
+        self.originals = {}
+        # Square size as the key and a dictionary of piece name to scaled image as the value with the least recently used first
+        self.scaled = OrderedDict()
+        # Number of square sizes kept before the least recently used is removed
+        self.maxSizes = maxSizes
+        # Stops the background thread and the app from scaling the same images at once
+        self.lock = threading.Lock()
+
+    # Decodes every image in the folder and converts it to the format of the screen with transparency. Called from the main thread since converting uses the display
+    def load(self):
+        for filename in os.listdir(self.path):
+            self.originals[os.path.splitext(filename)[0]] = pygame.image.load(os.path.join(self.path, filename)).convert_alpha()
+
+    # Returns the piece name as the key and the image scaled to the square size as the value, scaling them if they are not already stored. The images must be loaded first
+    def getImages(self, squareSize):
+        with self.lock:
+            images = self.scaled.get(squareSize)
+            if images is None:
+                if not self.originals:
+                    raise RuntimeError("Piece images have not been loaded")
+                # Resizes images to fit in squares
+                images = {name: pygame.transform.scale(image, (squareSize, squareSize)) for name, image in self.originals.items()}
+                self.scaled[squareSize] = images
+                # Removes the least recently used size once there are too many
+                if len(self.scaled) > self.maxSizes:
+                    self.scaled.popitem(last=False)
+            else:
+                # Marks the size as the most recently used
+                self.scaled.move_to_end(squareSize)
+            return images
+
+    # Scales the images to the square size in a background thread so they are ready before they are drawn. Nothing is scaled until the images are loaded
+    def prepare(self, squareSize):
+        if not self.originals:
+            return
+        threading.Thread(target=self.prepareImages, args=(squareSize,), daemon=True).start()
+
+    # Scales the images for prepare. Errors are logged and left for getImages to raise when the images are needed
+    def prepareImages(self, squareSize):
+        try:
+            self.getImages(squareSize)
+        except Exception:
+            logging.debug("Piece images unable to be scaled in the background")
@@ -0,0 +1,61 @@
+""" This file sets up logging so records are written to rotating files by a background thread instead of the thread running the game """
+
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+
+from Constants import *
+
+# Name of the logger the per move records are sent to
+MOVELOGGER = "moves"
+
+# Background thread that writes the queued records, or None if logging has not been set up
+listener = None
+
+
+# Sends every record to a queue written by a background thread. Game records go to a rotating log file and move records are written in batches to a rotating file of JSON lines
+def setupLogging(filename=LOGFILE, moveFilename=MOVELOGFILE, level=logging.DEBUG, maxBytes=LOGMAXBYTES, backupCount=LOGBACKUPCOUNT):
+    global listener
+    # Stops the listener of an earlier setup so records are not written twice
+    stopLogging()
+    # Writes the game records as they arrive. Once the file reaches maxBytes it is renamed and a new one is started
+    gameHandler = logging.handlers.RotatingFileHandler(filename, maxBytes=maxBytes, backupCount=backupCount)
+    gameHandler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    gameHandler.addFilter(lambda record: record.name != MOVELOGGER)
+    # Keeps the move records until a batch is full and writes them together
+    moveFileHandler = logging.handlers.RotatingFileHandler(moveFilename, maxBytes=maxBytes, backupCount=backupCount)
+    moveFileHandler.setFormatter(logging.Formatter("%(message)s"))
+    moveHandler = logging.handlers.MemoryHandler(MOVELOGBATCHSIZE, flushLevel=logging.ERROR, target=moveFileHandler)
+    moveHandler.addFilter(logging.Filter(MOVELOGGER))
+    # Move records are kept whatever level the game records are set to
+    logging.getLogger(MOVELOGGER).setLevel(logging.INFO)
+    # The game only puts records on the queue so it never waits for the disk
+    logQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(logQueue)]
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(logQueue, gameHandler, moveHandler, respect_handler_level=True)
+    listener.start()
+    # Writes the records left in the queue and the last batch of moves when the program closes
+    atexit.register(stopLogging)
+    return listener
+
+# Writes every queued record and stops the background thread
+def stopLogging():
+    global listener
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        # Closing the batch handler writes the moves it holds, after which its file can be closed
+        target = getattr(handler, "target", None)
+        handler.close()
+        if target is not None:
+            target.close()
+    listener = None
+
+# Logs a record of a move as a line of JSON with the move, who made it, how long it took to choose, and how many positions were searched for it
+def logMove(move, ply, seconds, positions=0):
+    logging.getLogger(MOVELOGGER).info(json.dumps({"ply": ply, "color": move.pieceMoved[0], "move": move.getChessNotation(), "seconds": round(seconds, 4), "positions": positions}))
@@ -3,33 +3,126 @@
 # Midterm Project
 
 ######## Must install pygame using pip install pygame ########
-######## Using version 1.9.6 ########
+######## Using version 2.x, 1.9.6 also works but waits for input instead of refreshing when idle ########
 
 
 """
 This is a multiplayer chess game that goes by normal chess rules. The pieces are moved by clicking on the piece and then clicking 
 again on where the piece should move to. The white pieces have the first turn unless changed in the options. The games will continue 
-until a checkmate or a stalemate occurs. Some helpful keyboard shortcuts are listed below:
+until a checkmate, a stalemate, or a draw by repetition, the fifty move rule, or insufficient material occurs. Some helpful 
+keyboard shortcuts are listed below:
 H - Displays a help menu during the game with these tips
 Z - Undoes the last move made and any number of moves can be undone
 R - Resets the game during any point throughout the game
 M - Resets the game and returns you back to the main menu
 X - Closes the window
+
+The move generator and engine can also be run without a window or pygame:
+python Main.py perft -d 4        Counts positions to check the move generator (see Perft.py for options)
+python Main.py search --fen FEN  Searches a position with the engine and prints the best move
+python Main.py validate FILE     Replays a PGN file or FEN corpus and checks every move is legal (see Validate.py for options)
+python Main.py tournament -g 10  Plays games between two move choosing policies (see Tournament.py for options)
 """
 
 import sys
 import logging
-logging.basicConfig(filename="GameLog.txt", level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+import argparse
+
+# Import Logger.py and starts writing the log in the background
+try:
+    from Logger import *
+    setupLogging()
+    logging.debug("Logger.py imported successfully")
+except:
+    logging.basicConfig(filename="GameLog.txt", level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.critical("Missing Logger.py")
 
-# Import AppClass.py
+# Import Constants.py
 try:
-    from AppClass import *
-    logging.debug("AppClass.py imported successfully")
+    from Constants import *
+    logging.debug("Constants.py imported successfully")
 except:
-    logging.critical("Missing AppClass.py")
+    logging.critical("Missing Constants.py")
     logging.critical("Program closing...")
     sys.exit(0)
 
 
+# Opens the game window. AppClass is only imported here so the commands without a window never load pygame
+def runApp():
+    # Import AppClass.py
+    try:
+        from AppClass import App
+        logging.debug("AppClass.py imported successfully")
+    except:
+        logging.critical("Missing AppClass.py")
+        logging.critical("Program closing...")
+        sys.exit(0)
+    App().run()
+    return 0
+
+# Counts positions with the perft tool passing it the rest of the arguments
+def runPerft(arguments):
+    from Perft import main as perftMain
+    return perftMain(arguments)
+
+# Replays a collection of games with the validator passing it the rest of the arguments
+def runValidate(arguments):
+    from Validate import main as validateMain
+    return validateMain(arguments)
+
+# Plays games between two policies with the tournament runner passing it the rest of the arguments
+def runTournament(arguments):
+    from Tournament import main as tournamentMain
+    return tournamentMain(arguments)
+
+# Searches a position with the engine and prints the result
+def runSearch(fen, maxDepth, timeLimit, nodeLimit):
+    from Engine import Engine
+    from Perft import createGame
+    result = Engine(maxDepth=maxDepth, timeLimit=timeLimit, nodeLimit=nodeLimit).search(createGame(fen, cache=True))
+    if result.bestMove is None:
+        print("no legal moves")
+        return 0
+    print("bestmove {} score {} depth {} nodes {} time {:.3f}s".format(result.bestMove.getChessNotation(), result.score, result.depth, result.nodes, result.seconds))
+    print("pv " + " ".join(move.getChessNotation() for move in result.pv))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chess game that opens the game window unless a command without a window is given")
+    parser.add_argument("--profile", metavar="FILE", help="times frames and sections of the game from the start and saves them to FILE on close, JSON unless FILE ends in .csv. P shows the times during a game")
+    parser.add_argument("--log-level", default="DEBUG", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], help="lowest level of the records written to the log")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("play", help="opens the game window, the same as giving no command")
+    # Help is left to Perft.py, Validate.py, and Tournament.py so their commands with -h list their options
+    subparsers.add_parser("perft", help="counts the positions reached by the move generator, see perft -h", add_help=False)
+    subparsers.add_parser("validate", help="replays a PGN file or FEN corpus across several processes and checks every move is legal, see validate -h", add_help=False)
+    subparsers.add_parser("tournament", help="plays games between two move choosing policies across several processes, see tournament -h", add_help=False)
+    searchParser = subparsers.add_parser("search", help="searches a position with the engine and prints the best move")
+    searchParser.add_argument("--fen", default=STARTFEN, help="FEN string of the position, the starting position if not given")
+    searchParser.add_argument("-d", "--depth", type=int, default=64, help="deepest search started")
+    searchParser.add_argument("-t", "--time", type=float, default=1.0, help="seconds the search is allowed to take")
+    searchParser.add_argument("-n", "--nodes", type=int, help="positions the search is allowed to visit")
+    # Arguments not known here are passed on to perft, the validator, or the tournament runner
+    args, remaining = parser.parse_known_args(argv)
+    logging.getLogger().setLevel(args.log_level)
+    # Import Profiler.py only when timing is asked for
+    if args.profile:
+        from Profiler import profiler
+        profiler.exportFile = args.profile
+        profiler.enable()
+
+    if args.command == "perft":
+        return runPerft(remaining)
+    if args.command == "validate":
+        return runValidate(remaining)
+    if args.command == "tournament":
+        return runTournament(remaining)
+    if remaining:
+        parser.error("unrecognized arguments: " + " ".join(remaining))
+    if args.command == "search":
+        return runSearch(args.fen, args.depth, args.time, args.nodes)
+    return runApp()
+
+
 if __name__ == "__main__":
-    App().run()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,245 @@
+""" This file stores the functions that read and write games in PGN so collections of games can be imported and exported one game at a time """
+
+import re
+
+from Constants import *
+from GameClasses import *
+
+# Tags written for every game in the order they are written
+SEVENTAGROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+# Results a game can end with. The result also ends the moves of a game in a PGN file
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# Longest line of moves written before starting a new line
+PGNLINELENGTH = 79
+# Splits a move in SAN into the piece, the file and rank of the starting square if given, the capture, the ending square, and the promotion piece. Promotion pieces are accepted in either case
+SANPATTERN = re.compile(r"^([KQRBN])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([QRBNqrbn]))?$")
+# Splits a tag line into its name and value
+TAGPATTERN = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Splits the moves of a game into comments, variations, and words such as move numbers, moves, and results
+TOKENPATTERN = re.compile(r"[{}();]|[^\s{}();]+")
+# Move number in front of a move such as "12." or "12..."
+MOVENUMBERPATTERN = re.compile(r"^\d+\.*")
+
+
+# Stores a game read from a PGN file as its tags and its moves in SAN. The moves are not checked until the game is replayed
+class PGNGame:
+    def __init__(self, tags=None, moves=None, result="*", lineNumber=0):
+        # Tag name as the key and its value as the value in the order they were read
+        self.tags = tags if tags is not None else {}
+        # List of the moves in SAN ie ["e4", "e5", "Nf3"]
+        self.moves = moves if moves is not None else []
+        # Result at the end of the moves
+        self.result = result
+        # Line of the file the game starts on. Used to point to a game when reporting errors
+        self.lineNumber = lineNumber
+
+    # Returns the FEN string of the position the game starts from
+    def getStartFEN(self):
+        return self.tags.get("FEN", STARTFEN)
+
+
+# Returns the move in SAN for the position the game is in. The move must be legal in that position. The legal moves are found if they are not given
+def getSAN(game, move, moves=None):
+    if move.isCastle:
+        san = "O-O" if move.endColumn - move.startColumn == 2 else "O-O-O"
+    else:
+        piece = move.pieceMoved[1]
+        endSquare = move.getRankFile(move.endRow, move.endColumn)
+        capture = "x" if move.pieceCaptured != "--" else ""
+        if piece == 'P':
+            # Pawn captures are written with the file the pawn started on
+            san = (COLUMNSTOFILES[move.startColumn] if capture else "") + capture + endSquare
+            if move.isPawnPromotion:
+                san += "=" + move.promotionPiece
+        else:
+            if moves is None:
+                moves = game.getValidMoves()
+            # Finds the other pieces of the same type that can move to the same square
+            others = [other for other in moves if other.pieceMoved == move.pieceMoved and other.endRow == move.endRow and other.endColumn == move.endColumn and (other.startRow, other.startColumn) != (move.startRow, move.startColumn)]
+            # Adds the file if it tells the pieces apart, otherwise the rank, otherwise both
+            disambiguation = ""
+            if others:
+                if all(other.startColumn != move.startColumn for other in others):
+                    disambiguation = COLUMNSTOFILES[move.startColumn]
+                elif all(other.startRow != move.startRow for other in others):
+                    disambiguation = ROWSTORANKS[move.startRow]
+                else:
+                    disambiguation = move.getRankFile(move.startRow, move.startColumn)
+            san = piece + disambiguation + capture + endSquare
+    # Keeps checkmate and stalemate for the position the move is made in so they can be set back without finding the legal moves again
+    checkmate, stalemate = game.checkmate, game.stalemate
+    # Makes the move to find out if it gives check or checkmate. The replies are only found when the move gives check
+    game.makeMove(move)
+    if game.inCheck():
+        san += "#" if len(game.getValidMoves()) == 0 else "+"
+    game.undoMove()
+    game.checkmate, game.stalemate = checkmate, stalemate
+    return san
+
+# Returns the legal move written in SAN for the position the game is in. Raises ValueError if the move is not legal or could be more than one move
+def parseSAN(game, san):
+    # Check, checkmate, and annotation symbols do not change the move
+    text = san.rstrip("+#!?")
+    moves = game.getValidMoves()
+    # Castle moves are found from the side of the board the king moves to. Zeros are accepted since some files use them
+    if text in ("O-O", "O-O-O", "0-0", "0-0-0"):
+        kingSide = len(text) == 3
+        for move in moves:
+            if move.isCastle and (move.endColumn > move.startColumn) == kingSide:
+                return move
+        raise ValueError("Illegal move: " + san)
+    match = SANPATTERN.match(text)
+    if match is None:
+        raise ValueError("Invalid SAN: " + san)
+    piece, startFile, startRank, capture, endSquare, promotionPiece = match.groups()
+    piece = piece or 'P'
+    promotionPiece = promotionPiece.upper() if promotionPiece else None
+    endRow = ROWSTORANKS.index(endSquare[1])
+    endColumn = COLUMNSTOFILES.index(endSquare[0])
+    startRow = ROWSTORANKS.index(startRank) if startRank else None
+    startColumn = COLUMNSTOFILES.index(startFile) if startFile else None
+    # Keeps the moves of the piece to the ending square that start on the file and rank given
+    candidates = []
+    for move in moves:
+        if move.pieceMoved[1] != piece or move.endRow != endRow or move.endColumn != endColumn or move.isCastle:
+            continue
+        if (startRow is not None and move.startRow != startRow) or (startColumn is not None and move.startColumn != startColumn):
+            continue
+        # A promotion without a piece given is taken as a queen
+        if move.isPawnPromotion and move.promotionPiece != (promotionPiece or 'Q'):
+            continue
+        if not move.isPawnPromotion and promotionPiece:
+            continue
+        candidates.append(move)
+    if not candidates:
+        raise ValueError("Illegal move: " + san)
+    if len(candidates) > 1:
+        raise ValueError("Ambiguous move: " + san)
+    return candidates[0]
+
+# Returns the result of the game from its current position, "*" if the game has not ended
+def getResult(game):
+    # Finds the legal moves so checkmate and stalemate are set for the current position
+    game.getValidMoves()
+    if game.checkmate:
+        return "0-1" if game.whitesMove else "1-0"
+    if game.stalemate or game.getDrawReason() is not None:
+        return "1/2-1/2"
+    return "*"
+
+# Reads games from a PGN file one at a time. Only the game being read is kept so files of any size can be read. Accepts a filename or anything that gives lines of text
+def readGames(file):
+    if isinstance(file, str):
+        with open(file, encoding="utf-8", errors="replace") as openFile:
+            yield from readGames(openFile)
+        return
+    tags = {}
+    moves = []
+    startLine = 0
+    # Keeps track of comments in braces and variations in parentheses since both can cover more than one line
+    inComment = False
+    variationDepth = 0
+    for lineNumber, line in enumerate(file, 1):
+        line = line.strip().lstrip("\ufeff")
+        if not inComment:
+            # Lines starting with % are escaped and skipped
+            if not line or line.startswith("%"):
+                continue
+            if line.startswith("["):
+                # A tag after moves starts the next game so the game before it is returned even without a result
+                if moves:
+                    yield PGNGame(tags, moves, tags.get("Result", "*"), startLine)
+                    tags = {}
+                    moves = []
+                    variationDepth = 0
+                match = TAGPATTERN.match(line)
+                if match is not None:
+                    if not tags:
+                        startLine = lineNumber
+                    tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                continue
+            if not tags and not moves:
+                startLine = lineNumber
+        for token in TOKENPATTERN.findall(line):
+            # Everything in a comment is skipped until it is closed
+            if inComment:
+                inComment = token != "}"
+                continue
+            if token == "{":
+                inComment = True
+            elif token == ";":
+                # The rest of the line is a comment
+                break
+            elif token == "(":
+                variationDepth += 1
+            elif token == ")":
+                variationDepth = max(variationDepth - 1, 0)
+            elif variationDepth == 0:
+                if token in RESULTS:
+                    yield PGNGame(tags, moves, token, startLine)
+                    tags = {}
+                    moves = []
+                    continue
+                # Removes the move number from the front of the move
+                token = MOVENUMBERPATTERN.sub("", token)
+                # Skips move numbers on their own and numeric annotations
+                if token and not token.startswith("$"):
+                    moves.append(token)
+    # Returns the last game if the file ended without its result
+    if tags or moves:
+        yield PGNGame(tags, moves, tags.get("Result", "*"), startLine)
+
+# Returns the game made by playing the moves of a PGNGame from its starting position. Raises ValueError naming the move if a move is not legal
+def replayGame(pgnGame, gameClass=Game):
+    game = gameClass.fromFEN(pgnGame.getStartFEN())
+    for ply, san in enumerate(pgnGame.moves, 1):
+        try:
+            move = parseSAN(game, san)
+        except ValueError as error:
+            raise ValueError("Ply {}: {}".format(ply, error))
+        game.makeMove(move)
+    return game
+
+# Returns the game as PGN text with the seven required tags followed by any others given. The result is found from the position if it is not given
+def getPGN(game, tags=None, result=None):
+    result = result or getResult(game)
+    # Undoes every move on a copy so the moves can be written in SAN for the positions they were made in
+    replay = game.copy()
+    moves = list(replay.moveHistory)
+    while replay.moveHistory:
+        replay.undoMove()
+    allTags = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?", "White": "?", "Black": "?"}
+    allTags.update(tags or {})
+    allTags["Result"] = result
+    # Games that do not start from the standard position record where they start
+    startFEN = replay.getFEN()
+    if startFEN != STARTFEN:
+        allTags["SetUp"] = "1"
+        allTags["FEN"] = startFEN
+    names = list(SEVENTAGROSTER) + [name for name in allTags if name not in SEVENTAGROSTER]
+    lines = ['[{} "{}"]'.format(name, str(allTags[name]).replace("\\", "\\\\").replace('"', '\\"')) for name in names]
+    lines.append("")
+    # Writes the move number before white's moves and before the first move if black moves first
+    tokens = []
+    for move in moves:
+        if replay.whitesMove:
+            tokens.append(str(replay.fullmoveNumber) + ".")
+        elif not tokens:
+            tokens.append(str(replay.fullmoveNumber) + "...")
+        tokens.append(getSAN(replay, move))
+        replay.makeMove(move)
+    tokens.append(result)
+    # Wraps the moves into lines no longer than PGNLINELENGTH
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > PGNLINELENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+# Writes the game to an open file as PGN. Called once for each game so games can be written as they finish
+def writeGame(file, game, tags=None, result=None):
+    file.write(getPGN(game, tags, result))
@@ -0,0 +1,174 @@
+""" This file stores the perft functions which count every position the move generator reaches to check it is correct and measure its speed """
+
+import sys
+import os
+import json
+import time
+import argparse
+
+from Constants import *
+from GameClasses import *
+from BitboardClasses import *
+
+# File the node counts and speeds of a run are recorded to and compared against. Speeds depend on the machine so the file is not committed and is made on each machine by running with --record
+BASELINEFILE = "PerftBaselines.json"
+
+# Standard test positions stored as the name, the FEN string, and the known number of positions at each depth starting with depth 1
+PERFTPOSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("middlegame", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("symmetrical", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+    ("illegal en passant pin", "8/5bk1/8/2Pp4/8/1K6/8/8 w - d6 0 1", [8, 104, 736, 9287, 62297, 824064]),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", [15, 126, 1928, 13931, 206379, 1440467]),
+    ("horizontal en passant pin", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", [18, 92, 1670, 10138, 185429, 1134888]),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", [15, 66, 1198, 6399, 120330, 661072]),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", [16, 71, 1286, 7418, 141077, 803711]),
+    ("castle rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", [26, 1141, 27826, 1274206]),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", [44, 1494, 50509, 1720476]),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", [11, 133, 1442, 19174, 266199, 3821001]),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", [29, 165, 5160, 31961, 1004658]),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", [9, 40, 472, 2661, 38983, 217342]),
+    ("underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", [6, 27, 273, 1329, 18135, 92683]),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", [2, 6, 13, 63, 382, 2217]),
+    ("stalemate and checkmate", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", [10, 25, 268, 926, 10857, 43261, 567584]),
+    ("stalemate and checkmate 2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", [37, 183, 6559, 23527]),
+]
+
+
+# Counts every position reached after the given number of moves
+def perft(game, depth):
+    if depth == 0:
+        return 1
+    moves = game.getValidMoves()
+    # The moves at the last depth are counted without being made
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.makeMove(move)
+        nodes += perft(game, depth - 1)
+        game.undoMove()
+    return nodes
+
+# Counts the positions reached after each of the first moves. Used to find which move a wrong count comes from
+def divide(game, depth):
+    counts = []
+    for move in game.getValidMoves():
+        game.makeMove(move)
+        counts.append((move.getChessNotation(), perft(game, depth - 1)))
+        game.undoMove()
+    return counts
+
+# Creates a game of the chosen backend set up at a position
+def createGame(fen, bitboard=False, reference=False, cache=False):
+    game = (BitboardGame if bitboard else Game).fromFEN(fen)
+    # The reference uses the make and undo legality check instead of the attack map
+    game.useAttackMap = not reference
+    # The legal move cache is turned off unless asked for so the move generator itself is measured
+    if not cache:
+        game.moveCacheSize = 0
+    return game
+
+# Runs perft on every position up to the maximum depth and returns the node counts, times, and any wrong counts
+def runSuite(positions, maxDepth, bitboard=False, reference=False, cache=False, output=sys.stdout):
+    results = {}
+    failures = []
+    for name, fen, counts in positions:
+        game = createGame(fen, bitboard, reference, cache)
+        results[name] = {}
+        for depth in range(1, min(maxDepth, len(counts)) + 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            seconds = time.perf_counter() - start
+            # Nodes per second is found from the positions counted at the last depth
+            results[name][str(depth)] = {"nodes": nodes, "seconds": seconds, "nps": nodes / seconds if seconds > 0 else 0.0}
+            status = "ok" if nodes == counts[depth - 1] else "FAILED expected " + str(counts[depth - 1])
+            if nodes != counts[depth - 1]:
+                failures.append((name, depth, nodes, counts[depth - 1]))
+            output.write("{:<28} depth {} {:>10} nodes {:>8.3f}s {:>10.0f} nodes/s {}\n".format(name, depth, nodes, seconds, results[name][str(depth)]["nps"], status))
+    return results, failures
+
+# Compares the results of a run to the recorded baselines and returns the positions that are slower than allowed and the positions with no baseline
+def compareBaselines(results, baselines, tolerance, output=sys.stdout):
+    regressions = []
+    missing = []
+    for name, depths in results.items():
+        for depth, result in depths.items():
+            baseline = baselines.get(name, {}).get(depth)
+            if baseline is None:
+                missing.append((name, depth))
+                continue
+            # Node counts are checked against the known values in runSuite so only the speed is compared here
+            change = result["nps"] / baseline["nps"] - 1 if baseline["nps"] else 0.0
+            if change < -tolerance:
+                regressions.append((name, depth, change))
+            output.write("{:<28} depth {} {:>+8.1%} nodes/s compared to baseline\n".format(name, depth, change))
+    return regressions, missing
+
+# Key the results are stored under in the baseline file for the backend and legality check used
+def baselineKey(bitboard, reference, cache=False):
+    return ("bitboard" if bitboard else "list") + ("-reference" if reference else "") + ("-cache" if cache else "")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counts the positions reached by the move generator to check it and measure its speed")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="maximum depth searched for each position")
+    parser.add_argument("-p", "--position", action="append", help="name of a position to run, can be used more than once")
+    parser.add_argument("--fen", help="runs divide on a FEN string instead of the test positions")
+    parser.add_argument("--divide", action="store_true", help="prints the count after each first move")
+    parser.add_argument("--bitboard", action="store_true", help="uses the bitboard game")
+    parser.add_argument("--reference", action="store_true", help="uses the make and undo legality check")
+    parser.add_argument("--cache", action="store_true", help="uses the legal move cache")
+    parser.add_argument("--record", action="store_true", help="records the results as the new baselines in " + BASELINEFILE + ", run once on a machine before using --compare")
+    parser.add_argument("--compare", action="store_true", help="compares the speed to the baselines recorded with --record and fails if there are none")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="fraction slower than the baseline allowed before failing")
+    args = parser.parse_args(argv)
+
+    # Divide on a single position
+    if args.fen or args.divide:
+        fens = [(args.fen, args.fen)] if args.fen else [(name, fen) for name, fen, counts in PERFTPOSITIONS if not args.position or name in args.position]
+        for name, fen in fens:
+            game = createGame(fen, args.bitboard, args.reference, args.cache)
+            start = time.perf_counter()
+            counts = divide(game, args.depth)
+            seconds = time.perf_counter() - start
+            print(name)
+            for notation, nodes in counts:
+                print("  {} {}".format(notation, nodes))
+            total = sum(nodes for notation, nodes in counts)
+            print("  total {} nodes in {:.3f}s {:.0f} nodes/s".format(total, seconds, total / seconds if seconds > 0 else 0.0))
+        return 0
+
+    positions = [position for position in PERFTPOSITIONS if not args.position or position[0] in args.position]
+    results, failures = runSuite(positions, args.depth, args.bitboard, args.reference, args.cache)
+    key = baselineKey(args.bitboard, args.reference, args.cache)
+    # Loads the baselines already recorded for every backend
+    baselines = {}
+    if os.path.isfile(BASELINEFILE):
+        with open(BASELINEFILE) as file:
+            baselines = json.load(file)
+    regressions = []
+    missing = []
+    if args.compare:
+        regressions, missing = compareBaselines(results, baselines.get(key, {}), args.tolerance)
+        # Positions that are being recorded now have a baseline for the next run
+        if missing and not args.record:
+            print("Warning: {} of the depths run have no {} baseline in {}, run with --record first".format(len(missing), key, BASELINEFILE), file=sys.stderr)
+        else:
+            missing = []
+    if args.record:
+        baselines.setdefault(key, {}).update(results)
+        with open(BASELINEFILE, "w") as file:
+            json.dump(baselines, file, indent=2)
+    for name, depth, nodes, expected in failures:
+        print("{} depth {}: {} nodes, expected {}".format(name, depth, nodes, expected))
+    for name, depth, change in regressions:
+        print("{} depth {}: {:.1%} slower than the baseline".format(name, depth, -change))
+    # Exits with an error if any count was wrong, any position got slower, or a position had no baseline to compare to
+    return 1 if failures or regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
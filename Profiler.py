@@ -0,0 +1,135 @@
+""" This file stores the profiler which times frames and sections of code so slow parts of the game can be measured """
+
+import csv
+import json
+import time
+import atexit
+from collections import deque
+from contextlib import contextmanager
+
+from Constants import *
+
+
+# Keeps the most recent times of each section and the time between frames
+class Profiler:
+    def __init__(self, windowSize=PROFILERWINDOW, exportFile=PROFILEFILE):
+        # Keeps track of whether times are recorded. Timing is off until it is turned on so it costs nothing otherwise
+        self.enabled = False
+        # Number of times kept for each section. Older times are removed as new ones are added
+        self.windowSize = windowSize
+        # Section name as the key and a deque of its most recent times in seconds as the value
+        self.sections = {}
+        # Time the last frame ended or None if no frame has ended since timing was turned on
+        self.lastFrameTime = None
+        # File the times are saved to when the program closes. JSON is used unless the file ends in .csv
+        self.exportFile = exportFile
+        # Keeps track of whether saving on close has been set up
+        self.exportRegistered = False
+
+    # Turns timing on and saves the times when the program closes
+    def enable(self):
+        self.enabled = True
+        if not self.exportRegistered and self.exportFile:
+            atexit.register(self.export)
+            self.exportRegistered = True
+
+    # Turns timing off. The times already recorded are kept
+    def disable(self):
+        self.enabled = False
+        self.lastFrameTime = None
+
+    # Turns timing on if it is off and off if it is on
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    # Times the code inside a with block and records it under the section name
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    # Adds a time in seconds to a section. Nothing is recorded while timing is off
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        times = self.sections.get(name)
+        if times is None:
+            times = self.sections[name] = deque(maxlen=self.windowSize)
+        times.append(seconds)
+
+    # Records the time since the last frame ended. Called once at the end of every frame
+    def frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.lastFrameTime is not None:
+            self.record("frame", now - self.lastFrameTime)
+        self.lastFrameTime = now
+
+    # Returns the number of frames shown each second from the recent frame times
+    def getFPS(self):
+        times = self.sections.get("frame")
+        if not times:
+            return 0.0
+        return len(times) / sum(times)
+
+    # Returns the count, mean, 50th, 95th, and 99th percentile, and maximum of a section's recent times in milliseconds
+    def getStats(self, name):
+        times = sorted(self.sections.get(name, ()))
+        if not times:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+        # Returns the time below which the fraction of the times fall
+        def percentile(fraction):
+            return times[min(int(fraction * len(times)), len(times) - 1)] * 1000
+
+        return {"count": len(times), "mean": sum(times) / len(times) * 1000, "p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99), "max": times[-1] * 1000}
+
+    # Returns the number of a section's recent times that fall in each bucket of PROFILERBUCKETS with the last count being the times above every bucket
+    def getHistogram(self, name):
+        counts = [0] * (len(PROFILERBUCKETS) + 1)
+        for seconds in self.sections.get(name, ()):
+            milliseconds = seconds * 1000
+            bucket = 0
+            while bucket < len(PROFILERBUCKETS) and milliseconds > PROFILERBUCKETS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        return counts
+
+    # Returns a line of text for the frame rate and each section to be shown on screen
+    def getLines(self):
+        lines = ["FPS {:5.1f}".format(self.getFPS())]
+        for name in sorted(self.sections):
+            stats = self.getStats(name)
+            lines.append("{:<14} p50 {:6.2f} p95 {:6.2f} p99 {:6.2f} ms".format(name, stats["p50"], stats["p95"], stats["p99"]))
+        return lines
+
+    # Saves the statistics and histogram of every section to exportFile as JSON, or as CSV if the file ends in .csv
+    def export(self, filename=None):
+        filename = filename or self.exportFile
+        if not self.sections:
+            return
+        labels = ["<={}ms".format(bucket) for bucket in PROFILERBUCKETS] + [">{}ms".format(PROFILERBUCKETS[-1])]
+        if filename.endswith(".csv"):
+            with open(filename, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["section", "count", "mean", "p50", "p95", "p99", "max"] + labels)
+                for name in sorted(self.sections):
+                    stats = self.getStats(name)
+                    writer.writerow([name] + [round(stats[key], 4) for key in ("count", "mean", "p50", "p95", "p99", "max")] + self.getHistogram(name))
+        else:
+            with open(filename, "w") as file:
+                json.dump({name: {"stats": self.getStats(name), "histogram": dict(zip(labels, self.getHistogram(name)))} for name in sorted(self.sections)}, file, indent=2)
+
+
+# Profiler shared by the whole program so any part of it can time a section
+profiler = Profiler()
@@ -0,0 +1,266 @@
+""" This file stores the tournament runner which plays games between two move choosing policies across several processes and reports the results """
+
+import sys
+import os
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from Constants import *
+from GameClasses import *
+from BitboardClasses import *
+from Engine import *
+from PGN import *
+
+# Openings played by both players before their policies take over, written in SAN. Each opening is played twice with the colors swapped
+OPENINGS = [
+    ("Ruy Lopez", "e4 e5 Nf3 Nc6 Bb5 a6"),
+    ("Italian Game", "e4 e5 Nf3 Nc6 Bc4 Bc5"),
+    ("Sicilian Defense", "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6"),
+    ("French Defense", "e4 e6 d4 d5 Nc3 Nf6"),
+    ("Caro-Kann Defense", "e4 c6 d4 d5 Nc3 dxe4 Nxe4"),
+    ("Queen's Gambit Declined", "d4 d5 c4 e6 Nc3 Nf6"),
+    ("King's Indian Defense", "d4 Nf6 c4 g6 Nc3 Bg7 e4 d6"),
+    ("English Opening", "c4 e5 Nc3 Nf6 g3 d5"),
+]
+
+
+# Chooses a random legal move
+class RandomPolicy:
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    # Returns the move and the number of positions looked at to choose it, which is every legal move generated
+    def chooseMove(self, game):
+        moves = game.getValidMoves()
+        return self.random.choice(moves), len(moves)
+
+
+# Chooses the best move found by the engine
+class EnginePolicy:
+    def __init__(self, maxDepth=64, timeLimit=None, nodeLimit=None):
+        self.engine = Engine(maxDepth=maxDepth, timeLimit=timeLimit, nodeLimit=nodeLimit)
+
+    # Returns the move and the number of positions the engine searched to choose it
+    def chooseMove(self, game):
+        result = self.engine.search(game)
+        return result.bestMove, result.nodes
+
+
+# Plays the moves of an opening while the game is in it and then lets another policy choose
+class ScriptedPolicy:
+    def __init__(self, moves, policy):
+        # List of the opening moves in SAN for both players starting from the first move of the game
+        self.moves = moves
+        # Policy that chooses once the opening has been played
+        self.policy = policy
+
+    # Returns the next opening move or the move chosen by the other policy. An opening move counts the legal moves generated to find it
+    def chooseMove(self, game):
+        ply = len(game.moveHistory)
+        if ply < len(self.moves):
+            return parseSAN(game, self.moves[ply]), len(game.getValidMoves())
+        return self.policy.chooseMove(game)
+
+
+# Creates a policy from a name such as "random", "engine", or "engine:depth=3,nodes=5000,time=0.5"
+def createPolicy(spec, seed=None):
+    name, separator, options = spec.partition(":")
+    if name == "random":
+        return RandomPolicy(seed)
+    if name == "engine":
+        limits = {"depth": 64, "time": None, "nodes": None}
+        for option in filter(None, options.split(",")):
+            key, separator, value = option.partition("=")
+            if key not in limits:
+                raise ValueError("Unknown engine option '" + key + "' in " + spec)
+            limits[key] = float(value) if key == "time" else int(value)
+        # The engine is given a small time limit if no limit is set so a move is always chosen
+        if limits["depth"] == 64 and limits["time"] is None and limits["nodes"] is None:
+            limits["time"] = 0.1
+        return EnginePolicy(limits["depth"], limits["time"], limits["nodes"])
+    raise ValueError("Unknown policy: " + spec)
+
+# Raises ValueError if a value the game keeps updated does not match the value found from the whole position. Used to find bugs in makeMove and undoMove
+def checkState(game):
+    if game.zobristKey != game.computeZobristKey():
+        raise ValueError("Zobrist key does not match the position " + game.getFEN())
+    if (game.materialScore, game.pieceSquareScore) != game.computeEvaluationScores():
+        raise ValueError("Evaluation scores do not match the position " + game.getFEN())
+    if (game.pieceCounts, game.bishopSquareCounts) != game.computePieceCounts():
+        raise ValueError("Piece counts do not match the position " + game.getFEN())
+    if isinstance(game, BitboardGame) and game.getBoardFromBitboards() != game.board:
+        raise ValueError("Bitboards do not match the board " + game.getFEN())
+
+# Plays one game and returns its result, length, positions looked at, and PGN. Run in a worker process
+def playGame(task):
+    index, specs, names, openingMoves, seed, maxPlies, startFEN, bitboard, check = task
+    start = time.perf_counter()
+    game = (BitboardGame if bitboard else Game).fromFEN(startFEN)
+    # Both players play the opening before their own policies choose
+    policies = [ScriptedPolicy(openingMoves, createPolicy(spec, None if seed is None else seed * 2 + side)) for side, spec in enumerate(specs)]
+    nodes = 0
+    error = None
+    try:
+        # Stops once the game is drawn so no time is spent on games that can not be won
+        while len(game.moveHistory) < maxPlies and game.getValidMoves() and game.getDrawReason() is None:
+            policy = policies[0 if game.whitesMove else 1]
+            fen = game.getFEN() if check else None
+            move, positions = policy.chooseMove(game)
+            # The engine makes and undoes moves on the game it is given so the position must be the same afterwards
+            if check and game.getFEN() != fen:
+                raise ValueError("Position changed while choosing a move from " + fen)
+            nodes += positions
+            game.makeMove(move)
+            if check:
+                checkState(game)
+    except ValueError as exception:
+        error = str(exception)
+    except Exception as exception:
+        # Any other error is a bug found while playing so it is reported for this game and the other games carry on
+        error = "{}: {}".format(type(exception).__name__, exception)
+    # Undoes every move on a copy to check the game returns to where it started
+    if check and error is None:
+        try:
+            replay = game.copy()
+            while replay.moveHistory:
+                replay.undoMove()
+                checkState(replay)
+            if replay.getFEN() != Game.fromFEN(startFEN).getFEN() or replay.repetitionCounts != {replay.getRepetitionKey(): 1}:
+                error = "Undoing every move did not return to the starting position"
+        except ValueError as exception:
+            error = "After undo: " + str(exception)
+        except Exception as exception:
+            error = "After undo: {}: {}".format(type(exception).__name__, exception)
+    try:
+        result = getResult(game)
+        ending = "error" if error else "checkmate" if game.checkmate else "stalemate" if game.stalemate else game.getDrawReason() or "max plies"
+        pgn = getPGN(game, {"Event": "Self-play", "Round": str(index + 1), "White": names[0], "Black": names[1], "PlyCount": str(len(game.moveHistory)), "Termination": ending}, result)
+    except Exception as exception:
+        # The game could not be scored or written so it is reported without its PGN
+        error = error or "{}: {}".format(type(exception).__name__, exception)
+        result, ending, pgn = "*", "error", ""
+    return {"index": index, "names": names, "result": result, "ending": ending, "error": error, "plies": len(game.moveHistory), "nodes": nodes, "seconds": time.perf_counter() - start, "worker": os.getpid(), "pgn": pgn}
+
+# Returns the task for each game. Players swap colors every game and each opening is played by both players as white
+def getTasks(games, specs, openings, seed, maxPlies, startFEN, bitboard, check):
+    names = ["1 " + specs[0], "2 " + specs[1]]
+    for index in range(games):
+        swap = index % 2 == 1
+        openingMoves = openings[(index // 2) % len(openings)] if openings else []
+        yield (index, specs[::-1] if swap else specs, names[::-1] if swap else names, openingMoves, None if seed is None else seed * 1000003 + index, maxPlies, startFEN, bitboard, check)
+
+# Plays the games across the worker processes and returns the results in the order the games were given
+def runGames(tasks, workers):
+    if workers <= 1:
+        for task in tasks:
+            yield playGame(task)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(playGame, tasks)
+
+# Returns the lines of the summary table with the score of each player, the game lengths, and the speed of each worker
+def getSummary(results, seconds):
+    lines = []
+    players = {}
+    for game in results:
+        white, black = game["names"]
+        for name, points in ((white, {"1-0": 1.0, "0-1": 0.0}.get(game["result"], 0.5)), (black, {"1-0": 0.0, "0-1": 1.0}.get(game["result"], 0.5))):
+            record = players.setdefault(name, {"games": 0, "wins": 0, "draws": 0, "losses": 0, "unfinished": 0})
+            record["games"] += 1
+            # Games stopped at the ply limit count as unfinished instead of as draws
+            if game["result"] == "*":
+                record["unfinished"] += 1
+            else:
+                record["wins" if points == 1.0 else "draws" if points == 0.5 else "losses"] += 1
+    lines.append("{:<32} {:>6} {:>6} {:>6} {:>6} {:>10} {:>7}".format("player", "games", "wins", "draws", "losses", "unfinished", "score"))
+    for name in sorted(players):
+        record = players[name]
+        finished = record["games"] - record["unfinished"]
+        score = (record["wins"] + record["draws"] / 2) / finished if finished else 0.0
+        lines.append("{:<32} {:>6} {:>6} {:>6} {:>6} {:>10} {:>7.1%}".format(name, record["games"], record["wins"], record["draws"], record["losses"], record["unfinished"], score))
+    lines.append("")
+    endings = {}
+    for game in results:
+        endings[game["ending"]] = endings.get(game["ending"], 0) + 1
+    lines.append("endings: " + ", ".join("{} {}".format(ending, count) for ending, count in sorted(endings.items())))
+    lengths = [game["plies"] for game in results]
+    if lengths:
+        lines.append("length: mean {:.1f} plies, min {}, max {}".format(sum(lengths) / len(lengths), min(lengths), max(lengths)))
+    lines.append("")
+    # Nodes per second is found for each worker from the time it spent playing its games. Nodes are the positions the engine searched and the legal moves generated for random and opening moves
+    workers = {}
+    for game in results:
+        record = workers.setdefault(game["worker"], {"games": 0, "plies": 0, "nodes": 0, "seconds": 0.0})
+        record["games"] += 1
+        record["plies"] += game["plies"]
+        record["nodes"] += game["nodes"]
+        record["seconds"] += game["seconds"]
+    lines.append("{:<10} {:>6} {:>8} {:>10} {:>9} {:>10}".format("worker", "games", "plies", "nodes", "seconds", "nodes/s"))
+    for worker in sorted(workers):
+        record = workers[worker]
+        lines.append("{:<10} {:>6} {:>8} {:>10} {:>9.2f} {:>10.0f}".format(worker, record["games"], record["plies"], record["nodes"], record["seconds"], record["nodes"] / record["seconds"] if record["seconds"] > 0 else 0.0))
+    totalNodes = sum(record["nodes"] for record in workers.values())
+    lines.append("{:<10} {:>6} {:>8} {:>10} {:>9.2f} {:>10.0f}".format("total", len(results), sum(lengths), totalNodes, seconds, totalNodes / seconds if seconds > 0 else 0.0))
+    return lines
+
+# Returns the opening moves to play from the built in openings or the games of a PGN file, cut to the number of plies given
+def loadOpenings(source, plies=None):
+    if source == "builtin":
+        openings = [moves.split() for name, moves in OPENINGS]
+    else:
+        openings = [pgnGame.moves for pgnGame in readGames(source) if pgnGame.moves]
+    return [moves[:plies] if plies else moves for moves in openings]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays games between two move choosing policies across several processes and writes the results as PGN and a summary table")
+    parser.add_argument("--player1", default="random", help="policy of the first player: random, or engine with optional limits such as engine:depth=3,nodes=5000,time=0.5")
+    parser.add_argument("--player2", default="random", help="policy of the second player, the same choices as --player1")
+    parser.add_argument("-g", "--games", type=int, default=10, help="number of games played. The players swap colors every game")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="number of processes, 1 plays the games without starting any")
+    parser.add_argument("--max-plies", type=int, default=300, help="moves by both players after which a game is stopped unfinished")
+    parser.add_argument("--openings", help="'builtin' or a PGN file of openings played by both players before their policies choose")
+    parser.add_argument("--opening-plies", type=int, help="number of moves of each opening played, all of them if not given")
+    parser.add_argument("--fen", default=STARTFEN, help="FEN string of the position every game starts from")
+    parser.add_argument("--seed", type=int, help="seed for the random policies so the games can be played again")
+    parser.add_argument("--pgn", help="file the games are written to as PGN")
+    parser.add_argument("--bitboard", action="store_true", help="uses the bitboard game")
+    parser.add_argument("--check", action="store_true", help="checks the zobrist key, scores, and bitboards against the position after every move and undo")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only writes the summary table")
+    args = parser.parse_args(argv)
+
+    # Checks the policies and openings before starting any games
+    for spec in (args.player1, args.player2):
+        try:
+            createPolicy(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    openings = loadOpenings(args.openings, args.opening_plies) if args.openings else []
+    tasks = getTasks(args.games, [args.player1, args.player2], openings, args.seed, args.max_plies, args.fen, args.bitboard, args.check)
+    results = []
+    errors = 0
+    start = time.perf_counter()
+    pgnFile = open(args.pgn, "w") if args.pgn else None
+    try:
+        for game in runGames(tasks, args.workers):
+            # Only the PGN is written out so the results kept in memory stay small
+            if pgnFile is not None:
+                pgnFile.write(game["pgn"])
+            del game["pgn"]
+            results.append(game)
+            if game["error"]:
+                errors += 1
+            if not args.quiet or game["error"]:
+                print("game {} {} vs {}: {} {} in {} plies{}".format(game["index"] + 1, game["names"][0], game["names"][1], game["result"], game["ending"], game["plies"], " ERROR " + game["error"] if game["error"] else ""))
+    finally:
+        if pgnFile is not None:
+            pgnFile.close()
+    print()
+    print("\n".join(getSummary(results, time.perf_counter() - start)))
+    # Exits with an error if any game found a move that was not legal or a state that did not match the position
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
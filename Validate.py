@@ -0,0 +1,203 @@
+""" This file stores the batch validator which replays collections of games across several processes to check every move is legal and report how each game ended """
+
+import sys
+import os
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from Constants import *
+from GameClasses import *
+from BitboardClasses import *
+from PGN import *
+
+# Number of games sent to a worker process at a time. Larger batches spend less time passing games between processes
+BATCHSIZE = 64
+# Width of the progress bar in characters
+PROGRESSWIDTH = 30
+
+
+# Draws a progress bar on one line showing how much of the file has been checked and how fast
+class Progress:
+    def __init__(self, total, output=sys.stderr, enabled=True):
+        # Number of characters in the file or 0 if it is not known
+        self.total = total
+        self.output = output
+        self.enabled = enabled
+        # Characters read from the file so far
+        self.read = 0
+        # Games checked so far
+        self.games = 0
+        self.startTime = time.perf_counter()
+        # Time the bar was last drawn. The bar is drawn at most ten times a second
+        self.drawTime = 0.0
+
+    # Draws the bar with the fraction of the file done up to the position given
+    def draw(self, position):
+        now = time.perf_counter()
+        if not self.enabled or now - self.drawTime < 0.1:
+            return
+        self.drawTime = now
+        fraction = min(position / self.total, 1.0) if self.total else 0.0
+        filled = int(fraction * PROGRESSWIDTH)
+        seconds = now - self.startTime
+        self.output.write("\r[{}{}] {:5.1%} {} games {:.0f} games/s".format("#" * filled, "-" * (PROGRESSWIDTH - filled), fraction, self.games, self.games / seconds if seconds > 0 else 0.0))
+        self.output.flush()
+
+    # Removes the bar so other lines can be written
+    def clear(self):
+        if self.enabled:
+            self.output.write("\r\033[K")
+
+
+# Reads lines from a file and counts the characters read so the progress bar knows how far through the file it is
+def countCharacters(file, progress):
+    for line in file:
+        progress.read += len(line)
+        yield line
+
+# Reads a FEN corpus with a FEN string on each line, optionally followed by "moves" and moves in the form "e2e4" or "a7a8q". Blank lines and lines starting with # are skipped
+def readFENs(file):
+    for lineNumber, line in enumerate(file, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fen, separator, moves = line.partition(" moves ")
+        yield PGNGame({"SetUp": "1", "FEN": fen.strip()}, moves.split(), "*", lineNumber)
+
+# Groups the games into batches and returns each batch with the position in the file it ends at
+def getBatches(games, progress, batchSize=BATCHSIZE):
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) == batchSize:
+            yield batch, progress.read
+            batch = []
+    if batch:
+        yield batch, progress.read
+
+# Returns the legal move written as "e2e4" or "a7a8q" for the position the game is in. Raises ValueError if the move is not legal
+def parseCoordinate(game, text):
+    if len(text) not in (4, 5) or text[0] not in COLUMNSTOFILES or text[2] not in COLUMNSTOFILES or text[1] not in ROWSTORANKS or text[3] not in ROWSTORANKS:
+        raise ValueError("Invalid move: " + text)
+    startSquare = (ROWSTORANKS.index(text[1]), COLUMNSTOFILES.index(text[0]))
+    endSquare = (ROWSTORANKS.index(text[3]), COLUMNSTOFILES.index(text[2]))
+    move = game.getMoveIndex().getMove(startSquare, endSquare, text[4].upper() if len(text) == 5 else 'Q')
+    # A promotion piece given for a move that is not a promotion is not legal
+    if move is None or (len(text) == 5 and not move.isPawnPromotion):
+        raise ValueError("Illegal move: " + text)
+    return move
+
+# Replays one game checking every move against the legal moves and returns how it ended and counts of what happened in it
+def validateGame(pgnGame, coordinate=False, bitboard=False):
+    start = time.perf_counter()
+    stats = {"line": pgnGame.lineNumber, "white": pgnGame.tags.get("White", "?"), "black": pgnGame.tags.get("Black", "?"), "plies": 0, "captures": 0, "checks": 0, "promotions": 0, "castles": 0, "error": None, "ending": None, "result": "*", "declared": pgnGame.result, "fen": None}
+    try:
+        game = (BitboardGame if bitboard else Game).fromFEN(pgnGame.getStartFEN())
+        for ply, text in enumerate(pgnGame.moves, 1):
+            # Moves are only found among the legal moves so a move that is not legal raises ValueError
+            try:
+                move = parseCoordinate(game, text) if coordinate else parseSAN(game, text)
+            except ValueError as error:
+                stats["error"] = "ply {}: {}".format(ply, error)
+                break
+            game.makeMove(move)
+            stats["plies"] += 1
+            stats["captures"] += move.pieceCaptured != "--"
+            stats["promotions"] += move.isPawnPromotion
+            stats["castles"] += move.isCastle
+            stats["checks"] += game.inCheck()
+        # Checks how the last position reached ended
+        stats["result"] = getResult(game)
+        stats["ending"] = "checkmate" if game.checkmate else "stalemate" if game.stalemate else game.getDrawReason()
+        stats["fen"] = game.getFEN()
+    except ValueError as error:
+        # The starting position could not be set up
+        stats["error"] = str(error)
+    except Exception as error:
+        # Any other error is reported for this game so one bad game does not stop the batch or the other workers
+        stats["error"] = "ply {}: {}: {}".format(stats["plies"] + 1, type(error).__name__, error)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+# Validates every game in a batch. Run in a worker process
+def validateBatch(batch, coordinate=False, bitboard=False):
+    return [validateGame(pgnGame, coordinate, bitboard) for pgnGame in batch]
+
+# Validates the batches across the worker processes and returns the results of each batch in the order the batches were given. Only a few batches are waiting at once so any number of games can be checked
+def runBatches(batches, workers, coordinate=False, bitboard=False):
+    # A single worker runs in this process without starting any others
+    if workers <= 1:
+        for batch, position in batches:
+            yield validateBatch(batch, coordinate, bitboard), position
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for batch, position in batches:
+            pending.append((executor.submit(validateBatch, batch, coordinate, bitboard), position))
+            # Waits for the oldest batch once every worker has two batches so the file is not read faster than it is checked
+            if len(pending) >= workers * 2:
+                future, donePosition = pending.popleft()
+                yield future.result(), donePosition
+        while pending:
+            future, donePosition = pending.popleft()
+            yield future.result(), donePosition
+
+# Returns a line of text describing the result of a game
+def formatResult(number, stats):
+    text = "game {} line {}: {} plies {} captures {} checks".format(number, stats["line"], stats["plies"], stats["captures"], stats["checks"])
+    if stats["error"]:
+        return text + " ILLEGAL " + stats["error"]
+    text += " " + (stats["ending"] or "unfinished") + " " + stats["result"]
+    # Notes games whose recorded result does not match a checkmate, stalemate, or draw found on the board
+    if stats["ending"] and stats["declared"] != stats["result"]:
+        text += " (recorded " + stats["declared"] + ")"
+    return text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replays a PGN file or FEN corpus across several processes and checks every move is legal")
+    parser.add_argument("file", help="PGN file, or FEN corpus with a FEN on each line optionally followed by 'moves e2e4 e7e5 ...'")
+    parser.add_argument("--format", choices=["pgn", "fen"], help="format of the file, found from the extension if not given")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="number of processes, 1 checks the games without starting any")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCHSIZE, help="number of games sent to a process at a time")
+    parser.add_argument("--bitboard", action="store_true", help="uses the bitboard game")
+    parser.add_argument("--json", action="store_true", help="writes each result as a line of JSON")
+    parser.add_argument("--errors-only", action="store_true", help="only writes the games with a move that is not legal")
+    parser.add_argument("--no-progress", action="store_true", help="hides the progress bar")
+    args = parser.parse_args(argv)
+
+    coordinate = (args.format or ("pgn" if args.file.lower().endswith(".pgn") else "fen")) == "fen"
+    progress = Progress(os.path.getsize(args.file), enabled=not args.no_progress and sys.stderr.isatty())
+    totals = {"games": 0, "illegal": 0, "checkmate": 0, "stalemate": 0, "draw": 0, "plies": 0}
+    start = time.perf_counter()
+    with open(args.file, encoding="utf-8", errors="replace") as file:
+        lines = countCharacters(file, progress)
+        games = readFENs(lines) if coordinate else readGames(lines)
+        for results, position in runBatches(getBatches(games, progress, args.batch_size), args.workers, coordinate, args.bitboard):
+            progress.clear()
+            for stats in results:
+                totals["games"] += 1
+                totals["plies"] += stats["plies"]
+                totals["illegal"] += stats["error"] is not None
+                # Draws by repetition, the fifty move rule, and insufficient material are counted together
+                if stats["ending"]:
+                    totals[stats["ending"] if stats["ending"] in totals else "draw"] += 1
+                # Results are written in the order the games are in the file as soon as their batch is done
+                if args.errors_only and stats["error"] is None:
+                    continue
+                print(json.dumps(dict(stats, game=totals["games"])) if args.json else formatResult(totals["games"], stats))
+            sys.stdout.flush()
+            progress.games = totals["games"]
+            progress.draw(position)
+    progress.clear()
+    seconds = time.perf_counter() - start
+    summary = "{} games {} plies {} illegal {} checkmates {} stalemates {} draws in {:.2f}s {:.0f} plies/s".format(totals["games"], totals["plies"], totals["illegal"], totals["checkmate"], totals["stalemate"], totals["draw"], seconds, totals["plies"] / seconds if seconds > 0 else 0.0)
+    print(json.dumps({"summary": dict(totals, seconds=seconds)}) if args.json else summary)
+    # Exits with an error if any game had a move that is not legal
+    return 1 if totals["illegal"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())